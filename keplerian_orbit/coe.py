@@ -1,5 +1,5 @@
 import numpy as np
-from utilities.attitude import ROT1, ROT2, ROT3
+from utilities.attitude import pqw_to_inertial
 
 def coe2rv(p,ecc,inc,raan,arg_p,nu,mu):
     """
@@ -28,9 +28,7 @@ def coe2rv(p,ecc,inc,raan,arg_p,nu,mu):
            - V_pqw - velocity vector in perifocal frame (km/sec)
 
        Dependencies:
-           - ROT1 - elementary rotation about first axis
-           - ROT2 - elementary rotation about second axis
-           - ROT3 - elementary rotation about third axis
+           - pqw_to_inertial - 3-1-3 rotation from perifocal to inertial frame
 
        Author:
            - Shankar Kulumani 18 Aug 2012
@@ -88,7 +86,7 @@ def coe2rv(p,ecc,inc,raan,arg_p,nu,mu):
     #         sin(raan) * cos(arg_p) + cos(raan) * cos(inc) * sin(arg_p) -sin(raan) * sin(arg_p) + cos(raan) * cos(inc) * cos(arg_p) -cos(raan) * sin(inc);
     #         sin(inc) * sin(arg_p) sin(inc) * cos(arg_p) cos(inc);]
     
-    PI = ROT3(-raan).dot(ROT1(-inc)).dot(ROT3(-arg_p))
+    PI = pqw_to_inertial(raan,inc,arg_p)
     
     # rotate postion and velocity vectors to inertial frame
     R_ijk = np.dot(PI,R_pqw)
@@ -96,7 +94,159 @@ def coe2rv(p,ecc,inc,raan,arg_p,nu,mu):
 
     return (R_ijk,V_ijk,R_pqw,V_pqw)
 
+def coe2rv_vec(p,ecc,inc,raan,arg_p,nu,mu):
+    """
+       Purpose:
+           - Batched version of coe2rv. Converts arrays of classical orbital
+               elements to position and velocity vectors in a single pass.
+
+       [R_ijk,V_ijk,R_pqw,V_pqw] = coe2rv_vec(p,ecc,inc,raan,arg_p,nu,mu)
+
+       Inputs:
+           - p - semi-latus rectum (km) (N,) array or scalar
+           - ecc - eccentricity
+           - inc - inclination (rad) 0 < inc < pi
+           - raan - right acsension of the ascending node (rad) 0 < raan <2*pi
+           - arg_p - argument of periapsis (rad) 0 < arg_p < 2*pi
+           - nu - true anomaly (rad) 0 < nu < 2*pi
+           - mu - gravitational parameter of central body (km^3/sec^2).
+
+           All elements are broadcast together. The circular and equatorial
+           special cases of coe2rv are applied element by element with masks.
+
+       Outputs:
+           - R_ijk - (N,3) position vectors in inertial frame (km)
+           - V_ijk - (N,3) velocity vectors in inertial frame (km/sec)
+           - R_pqw - (N,3) position vectors in perifocal frame (km)
+           - V_pqw - (N,3) velocity vectors in perifocal frame (km/sec)
+    """
+
+    tol = 1e-9
+
+    p, ecc, inc, raan, arg_p, nu = [np.ravel(x).astype(float) for x in
+        np.broadcast_arrays(p, ecc, inc, raan, arg_p, nu)]
+
+    # check eccentricity for special cases
+    circular = ecc < tol
+    equatorial = (inc < tol) | (np.absolute(inc - np.pi) < tol)
+
+    # elliptical equatorial uses the longitude of periapsis
+    arg_p = np.where(~circular & equatorial, raan + arg_p, arg_p)
+    # circular orbits use the argument of latitude/true longitude
+    arg_p = np.where(circular, 0.0, arg_p)
+    raan = np.where(equatorial, 0.0, raan)
+
+    cosnu = np.cos(nu)
+    sinnu = np.sin(nu)
+
+    radius = p/(1+ecc*cosnu)
+
+    # semi latus rectum check
+    p = np.where(np.absolute(p) < 0.0001, 0.0001, p)
+
+    # calculate postion and velocity in perifocal frame
+    zero = np.zeros_like(radius)
+    R_pqw = np.stack((radius*cosnu, radius*sinnu, zero), axis=-1)
+    V_pqw = np.sqrt(mu/p)[:,np.newaxis]*np.stack((-sinnu, ecc+cosnu, zero), axis=-1)
+
+    # stack of perifocal to inertial rotations
+    PI = pqw_to_inertial(raan,inc,arg_p)
+
+    # rotate postion and velocity vectors to inertial frame
+    R_ijk = np.einsum('nij,nj->ni', PI, R_pqw)
+    V_ijk = np.einsum('nij,nj->ni', PI, V_pqw)
+
+    return (R_ijk,V_ijk,R_pqw,V_pqw)
+
+def rv2coe(r,v,mu):
+    """
+       Purpose:
+           - Convert position (R) and velocity (V) vectors to the classical
+               orbital elements (COEs). Inverse of coe2rv_vec and works on
+               arrays of states.
+
+       [p,ecc,inc,raan,arg_p,nu] = rv2coe(R_ijk,V_ijk,mu)
+
+       Inputs:
+           - R_ijk - (N,3) or (3,) position vectors in inertial frame (km)
+           - V_ijk - (N,3) or (3,) velocity vectors in inertial frame (km/sec)
+           - mu - gravitational parameter of central body (km^3/sec^2).
+
+       Outputs:
+           - p - semi-latus rectum (km)
+           - ecc - eccentricity
+           - inc - inclination (rad) 0 < inc < pi
+           - raan - right acsension of the ascending node (rad) 0 < raan <2*pi
+           - arg_p - argument of periapsis (rad) 0 < arg_p < 2*pi
+           - nu - true anomaly (rad) 0 < nu < 2*pi
+
+           Special cases follow coe2rv. Circular orbits have arg_p = 0 and
+           nu is the argument of latitude (true longitude if equatorial).
+           Equatorial orbits have raan = 0 and elliptical equatorial orbits
+           return the longitude of periapsis as arg_p.
+
+       References:
+           - Vallado 3rd Ed Algorithm 9
+    """
+
+    tol = 1e-9
+
+    r = np.atleast_2d(np.asarray(r, dtype=float))
+    v = np.atleast_2d(np.asarray(v, dtype=float))
+
+    r_mag = np.sqrt(np.sum(r*r, axis=-1))
+    v_mag2 = np.sum(v*v, axis=-1)
+    rdotv = np.sum(r*v, axis=-1)
+
+    h = np.cross(r, v)
+    h_mag = np.sqrt(np.sum(h*h, axis=-1))
+    h_hat = h/h_mag[:,np.newaxis]
+
+    p = h_mag**2/mu
+
+    e_vec = ((v_mag2 - mu/r_mag)[:,np.newaxis]*r - rdotv[:,np.newaxis]*v)/mu
+    ecc = np.sqrt(np.sum(e_vec*e_vec, axis=-1))
+
+    inc = np.arccos(np.clip(h_hat[:,2], -1.0, 1.0))
+
+    circular = ecc < tol
+    equatorial = (inc < tol) | (np.absolute(inc - np.pi) < tol)
+
+    # node vector, the inertial x axis for equatorial orbits
+    node = np.stack((-h[:,1], h[:,0], np.zeros_like(h_mag)), axis=-1)
+    node_mag = np.sqrt(np.sum(node*node, axis=-1))
+    node = np.where(equatorial[:,np.newaxis], np.array([1.0, 0.0, 0.0]),
+                    node/np.where(node_mag > 0, node_mag, 1.0)[:,np.newaxis])
+
+    raan = np.where(equatorial, 0.0, np.arctan2(node[:,1], node[:,0]))
+
+    # angle from a to b measured positive about the angular momentum
+    def plane_angle(a, b):
+        return np.arctan2(np.sum(h_hat*np.cross(a, b), axis=-1), np.sum(a*b, axis=-1))
+
+    arg_p = np.where(circular, 0.0, plane_angle(node, e_vec))
+    # circular orbits measure the anomaly from the node (or inertial x)
+    periapsis = np.where(circular[:,np.newaxis], node, e_vec)
+    nu = plane_angle(periapsis, r)
+
+    two_pi = 2*np.pi
+    return (p, ecc, inc, np.mod(raan, two_pi), np.mod(arg_p, two_pi), np.mod(nu, two_pi))
 
+if __name__ == "__main__":
+    import time
 
+    # throughput of the batched conversions
+    mu = 398600.5 # km^3 /sec^2
+    N = 100000
+    rng = np.random.RandomState(0)
+    coe = (rng.uniform(7000.0, 50000.0, N), rng.uniform(0.0, 0.9, N),
+           rng.uniform(0.0, np.pi, N), rng.uniform(0.0, 2*np.pi, N),
+           rng.uniform(0.0, 2*np.pi, N), rng.uniform(0.0, 2*np.pi, N))
 
+    start = time.time()
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv_vec(*coe, mu=mu)
+    print("coe2rv_vec: %d states in %6.4f sec" % (N, time.time() - start))
 
+    start = time.time()
+    rv2coe(R_ijk, V_ijk, mu)
+    print("rv2coe: %d states in %6.4f sec" % (N, time.time() - start))
@@ -0,0 +1,184 @@
+"""Minimum orbit intersection distance between elliptical orbits"""
+import numpy as np
+from utilities.attitude import pqw_to_inertial
+
+def moid(coe_1, coe_2, n_grid=64, n_candidates=4, max_iter=8, chunk_size=16384):
+    """
+    (dist,nu_1,nu_2) = moid(coe_1, coe_2)
+    Purpose:
+       - Compute the minimum orbit intersection distance (MOID) between
+       pairs of elliptical orbits, e.g. every asteroid of a catalog and one
+       planet. The elements of each pair are processed in chunks of
+       chunk_size pairs, see moid_dcm for the method.
+
+    Inputs:
+       - coe_1 - (p,ecc,inc,raan,argp,nu) tuple as returned by asteroid_coe
+       or planet_coe, or an (N,6) array of them. The anomaly is ignored.
+       - coe_2 - the second orbit(s), broadcast against coe_1
+       - n_grid - number of coarse points along the first orbit
+       - n_candidates - local minima of the coarse search that are refined
+       - max_iter - newton iterations of the refinement
+       - chunk_size - number of pairs evaluated at once
+
+    Outputs:
+       - dist - (N,) MOID in the units of p, nan for open orbits
+       - nu_1 - (N,) true anomaly on the first orbit at the MOID (rad)
+       - nu_2 - (N,) true anomaly on the second orbit at the MOID (rad)
+    """
+    coe_1 = np.atleast_2d(np.asarray(coe_1, dtype=float))
+    coe_2 = np.atleast_2d(np.asarray(coe_2, dtype=float))
+    coe_1, coe_2 = np.broadcast_arrays(coe_1, coe_2)
+
+    N = coe_1.shape[0]
+    dist = np.empty(N)
+    nu_1 = np.empty(N)
+    nu_2 = np.empty(N)
+
+    for start in range(0, N, chunk_size):
+        rows = slice(start, start + chunk_size)
+        p_1, ecc_1, inc_1, raan_1, argp_1 = coe_1[rows, :5].T
+        p_2, ecc_2, inc_2, raan_2, argp_2 = coe_2[rows, :5].T
+
+        dist[rows], nu_1[rows], nu_2[rows] = moid_dcm(
+            p_1/(1 - ecc_1**2), ecc_1, pqw_to_inertial(raan_1, inc_1, argp_1),
+            p_2/(1 - ecc_2**2), ecc_2, pqw_to_inertial(raan_2, inc_2, argp_2),
+            n_grid, n_candidates, max_iter)
+
+    return (dist, nu_1, nu_2)
+
+def moid_dcm(a_1, ecc_1, dcm_1, a_2, ecc_2, dcm_2, n_grid=64, n_candidates=4, max_iter=8):
+    """
+        MOID from the semi-major axes, eccentricities and PQW to ECI matrices
+
+        Same outputs as moid. The (N,3,3) matrices can be taken straight
+        from the persisted catalog invariants (AsteroidCatalog.dcm_pqw2eci)
+        and a single orbit (scalar a_2, (3,3) dcm_2) is broadcast against
+        all of the first orbits.
+
+        The first orbit is sampled at n_grid eccentric anomalies and every
+        sample is rotated into the perifocal frame of the second orbit. The
+        point of the second orbit with the same polar angle is used as its
+        partner, which reduces the coarse search to one dimension. The
+        n_candidates smallest local minima along the first orbit are then
+        refined with a newton iteration on the squared distance over both
+        eccentric anomalies and the smallest result is kept.
+    """
+    a_1 = np.atleast_1d(np.asarray(a_1, dtype=float))
+    ecc_1 = np.atleast_1d(np.asarray(ecc_1, dtype=float))
+    dcm_1 = np.asarray(dcm_1, dtype=float).reshape(-1, 3, 3)
+    N = max(a_1.shape[0], dcm_1.shape[0])
+    a_1, ecc_1 = np.broadcast_to(a_1, (N,)), np.broadcast_to(ecc_1, (N,))
+    a_2 = np.broadcast_to(np.asarray(a_2, dtype=float), (N,))
+    ecc_2 = np.broadcast_to(np.asarray(ecc_2, dtype=float), (N,))
+    dcm_2 = np.broadcast_to(np.asarray(dcm_2, dtype=float).reshape(-1, 3, 3), (N, 3, 3))
+
+    closed = (ecc_1 < 1) & (ecc_2 < 1) & (a_1 > 0) & (a_2 > 0)
+    with np.errstate(invalid='ignore'):
+        b_1 = a_1*np.sqrt(1 - ecc_1**2)
+        b_2 = a_2*np.sqrt(1 - ecc_2**2)
+    p_2 = a_2*(1 - ecc_2**2)
+
+    # P, Q of the first orbit in the perifocal frame of the second, so the
+    # second orbit lies in the x-y plane with periapsis along x
+    pq_1 = np.einsum('nji,njk->nik', dcm_2, dcm_1[:, :, :2])
+    aP = a_1[:, np.newaxis]*pq_1[:, :, 0]
+    bQ = b_1[:, np.newaxis]*pq_1[:, :, 1]
+    offset = -ecc_1[:, np.newaxis]*aP
+
+    # coarse search along the first orbit, the partner on the second orbit
+    # is the point at the same polar angle in its plane
+    E_grid = 2*np.pi*np.arange(n_grid)/n_grid
+    cosE = np.cos(E_grid)
+    sinE = np.sin(E_grid)
+    x, y, z = [offset[:, k, np.newaxis] + aP[:, k, np.newaxis]*cosE + bQ[:, k, np.newaxis]*sinE
+               for k in range(3)]
+    rho = np.sqrt(x*x + y*y)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        r_2 = p_2[:, np.newaxis]/(1 + ecc_2[:, np.newaxis]*x/rho)
+    dist2 = (rho - r_2)**2 + z*z
+
+    # keep the smallest local minima along the grid
+    minimum = (dist2 <= np.roll(dist2, 1, axis=1)) & (dist2 <= np.roll(dist2, -1, axis=1))
+    n_candidates = min(n_candidates, n_grid)
+    cand = np.argpartition(np.where(minimum, dist2, np.inf), n_candidates - 1, axis=1)[:, :n_candidates]
+
+    rows = np.repeat(np.arange(N), n_candidates)
+    cand = cand.ravel()
+    E_1 = E_grid[cand]
+    nu_proj = np.arctan2(y[rows, cand], x[rows, cand])
+    with np.errstate(invalid='ignore'):
+        E_2 = np.arctan2(np.sqrt(1 - ecc_2[rows]**2)*np.sin(nu_proj), ecc_2[rows] + np.cos(nu_proj))
+    dist2_coarse = dist2[rows, cand]
+
+    E_1_ref, E_2_ref, dist2_ref = _refine(offset[rows], aP[rows], bQ[rows],
+                                          a_2[rows], b_2[rows], ecc_2[rows],
+                                          E_1, E_2, max_iter)
+
+    # fall back to the coarse point if the refinement did not improve it
+    improved = dist2_ref <= dist2_coarse
+    E_1 = np.where(improved, E_1_ref, E_1)
+    E_2 = np.where(improved, E_2_ref, E_2)
+    dist2_ref = np.where(improved, dist2_ref, dist2_coarse)
+    dist2_ref = np.where(np.isfinite(dist2_ref), dist2_ref, np.inf).reshape(N, n_candidates)
+    best = np.argmin(dist2_ref, axis=1)
+    pick = np.arange(N)*n_candidates + best
+
+    dist = np.sqrt(dist2_ref[np.arange(N), best])
+    nu_1 = _eccentric_to_true(E_1[pick], ecc_1)
+    nu_2 = _eccentric_to_true(E_2[pick], ecc_2)
+
+    dist = np.where(closed, dist, np.nan)
+
+    return (dist, nu_1, nu_2)
+
+def _refine(offset, aP, bQ, a_2, b_2, ecc_2, E_1, E_2, max_iter):
+    """
+        Newton iteration on the squared distance over both eccentric anomalies
+
+        The first orbit is r_1 = offset + aP cos(E_1) + bQ sin(E_1) and the
+        second lies in the x-y plane, r_2 = (a_2 (cos(E_2) - ecc_2), b_2 sin(E_2), 0).
+    """
+    for count in range(max_iter + 1):
+        cos_1 = np.cos(E_1)[:, np.newaxis]
+        sin_1 = np.sin(E_1)[:, np.newaxis]
+        cos_2 = np.cos(E_2)
+        sin_2 = np.sin(E_2)
+
+        d = offset + aP*cos_1 + bQ*sin_1
+        d[:, 0] -= a_2*(cos_2 - ecc_2)
+        d[:, 1] -= b_2*sin_2
+        if count == max_iter:
+            break
+
+        dr_1 = bQ*cos_1 - aP*sin_1
+        ddr_1 = -aP*cos_1 - bQ*sin_1
+        dr_2x = -a_2*sin_2
+        dr_2y = b_2*cos_2
+
+        g_1 = np.einsum('ij,ij->i', d, dr_1)
+        g_2 = -(d[:, 0]*dr_2x + d[:, 1]*dr_2y)
+        H_11 = np.einsum('ij,ij->i', dr_1, dr_1) + np.einsum('ij,ij->i', d, ddr_1)
+        H_22 = dr_2x*dr_2x + dr_2y*dr_2y + d[:, 0]*a_2*cos_2 + d[:, 1]*b_2*sin_2
+        H_12 = -(dr_1[:, 0]*dr_2x + dr_1[:, 1]*dr_2y)
+        det = H_11*H_22 - H_12*H_12
+
+        # newton step where the hessian is positive definite, else a
+        # scaled gradient step
+        newton = (det > 0) & (H_11 > 0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            step_1 = np.where(newton, (H_22*g_1 - H_12*g_2)/det,
+                              g_1/(np.absolute(H_11) + np.absolute(H_12) + 1e-300))
+            step_2 = np.where(newton, (H_11*g_2 - H_12*g_1)/det,
+                              g_2/(np.absolute(H_22) + np.absolute(H_12) + 1e-300))
+
+        # limit the step so a single iteration can not jump to another minimum
+        E_1 = E_1 - np.clip(step_1, -0.5, 0.5)
+        E_2 = E_2 - np.clip(step_2, -0.5, 0.5)
+
+    return (E_1, E_2, np.einsum('ij,ij->i', d, d))
+
+def _eccentric_to_true(E, ecc):
+    """True anomaly in 0 <= nu < 2pi from the eccentric anomaly of an ellipse"""
+    with np.errstate(invalid='ignore'):
+        nu = np.arctan2(np.sqrt(1 - ecc**2)*np.sin(E), np.cos(E) - ecc)
+    return np.mod(nu, 2*np.pi)
@@ -0,0 +1,141 @@
+"""Compact orbit object that caches per-orbit invariants"""
+import numpy as np
+from utilities.attitude import pqw_to_inertial
+from keplerian_orbit.keplerian_orbit import kepler_eq_E, kepler_eq_E_vec, nu2anom, open_anomaly_limit
+
+class KeplerOrbit(object):
+    """
+        Keplerian orbit with the per-orbit invariants computed once
+
+        orbit = KeplerOrbit(p,ecc,inc,raan,arg_p,nu,mu)
+
+        The element arguments are in the same order as the tuples returned
+        by planet_coe and asteroid_coe, so an orbit can be built with
+        KeplerOrbit(*planet_coe(JD,planet_flag), mu=mu). The semi-major axis,
+        mean motion, sqrt(mu/p), the epoch mean anomaly and the perifocal to
+        inertial rotation are computed once, so each epoch only costs a
+        Kepler solve and a 3x3 multiply.
+
+        Inputs:
+           - p - semi-latus rectum
+           - ecc - eccentricity
+           - inc - inclination (rad)
+           - raan - right ascension of the ascending node (rad)
+           - arg_p - argument of periapsis (rad)
+           - nu - true anomaly at the epoch (rad)
+           - mu - gravitational parameter (consistent units with p)
+
+        Times passed to the methods are seconds since the epoch.
+    """
+
+    __slots__ = ('p', 'ecc', 'inc', 'raan', 'arg_p', 'nu', 'mu',
+                 'a', 'n', 'sqrt_mu_p', 'M_0', 'dcm_pqw2eci', 'conic')
+
+    def __init__(self, p, ecc, inc, raan, arg_p, nu, mu):
+        tol = 1e-9
+
+        # same special cases as coe2rv
+        if ecc < tol:
+            if inc < tol or abs(inc - np.pi) < tol:
+                raan = 0.0
+            arg_p = 0.0
+        elif inc < tol or abs(inc - np.pi) < tol:
+            arg_p = raan + arg_p
+            raan = 0.0
+
+        self.p = p
+        self.ecc = ecc
+        self.inc = inc
+        self.raan = raan
+        self.arg_p = arg_p
+        self.nu = nu
+        self.mu = mu
+
+        if abs(ecc - 1) < tol:
+            self.conic = 'parabolic'
+            self.a = np.inf
+            self.n = 2*np.sqrt(mu/p**3)
+        else:
+            self.conic = 'hyperbolic' if ecc > 1 else 'elliptical'
+            self.a = p/(1 - ecc**2)
+            self.n = np.sqrt(mu/abs(self.a)**3)
+
+        self.sqrt_mu_p = np.sqrt(mu/max(abs(p), 0.0001))
+        self.M_0 = nu2anom(nu, ecc)[1]
+        self.dcm_pqw2eci = pqw_to_inertial(raan, inc, arg_p)
+
+    def __repr__(self):
+        return ("KeplerOrbit(p=%r, ecc=%r, inc=%r, raan=%r, arg_p=%r, nu=%r, mu=%r)"
+                % (self.p, self.ecc, self.inc, self.raan, self.arg_p, self.nu, self.mu))
+
+    def mean_anomaly(self, t):
+        """Mean anomaly at t seconds after the epoch (scalar or array)"""
+        M = self.M_0 + self.n*np.asarray(t, dtype=float)
+        if self.conic == 'elliptical':
+            M = M - 2*np.pi*np.floor(M/(2*np.pi))
+        return M
+
+    def true_anomaly(self, t):
+        """True anomaly at t seconds after the epoch (scalar or array)"""
+        M = self.mean_anomaly(t)
+        if self.conic != 'elliptical':
+            # |M| grows without bound on open orbits, the asinh starter of
+            # the halley method converges where the scalar guess diverges
+            return kepler_eq_E_vec(M, self.ecc, method='halley')[1]
+        elif np.ndim(M) > 0:
+            return kepler_eq_E_vec(M, self.ecc)[1]
+        else:
+            return kepler_eq_E(M, self.ecc)[1]
+
+    def state_at(self, t):
+        """
+            (r,v) = orbit.state_at(t)
+
+            Inertial position and velocity (3,) at t seconds after the epoch
+        """
+        nu = self.true_anomaly(t)
+        cosnu = np.cos(nu)
+        sinnu = np.sin(nu)
+        radius = self.p/(1 + self.ecc*cosnu)
+
+        dcm = self.dcm_pqw2eci
+        r = dcm[:, 0]*radius*cosnu + dcm[:, 1]*radius*sinnu
+        v = self.sqrt_mu_p*(-dcm[:, 0]*sinnu + dcm[:, 1]*(self.ecc + cosnu))
+
+        return (r, v)
+
+    def states_at(self, times):
+        """
+            (r,v) = orbit.states_at(times)
+
+            Inertial positions and velocities (N,3) at an array of times
+            (seconds after the epoch) with a single batched Kepler solve
+        """
+        nu = self.true_anomaly(np.atleast_1d(times))
+        cosnu = np.cos(nu)
+        sinnu = np.sin(nu)
+        radius = self.p/(1 + self.ecc*cosnu)
+
+        pq = self.dcm_pqw2eci[:, :2].T
+        r = np.stack((radius*cosnu, radius*sinnu), axis=-1).dot(pq)
+        v = self.sqrt_mu_p*np.stack((-sinnu, self.ecc + cosnu), axis=-1).dot(pq)
+
+        return (r, v)
+
+    def polyline(self, n=1000, r_max=None):
+        """
+            xyz = orbit.polyline(n)
+
+            (n,3) inertial points along the orbit. Closed orbits are sampled
+            over a full revolution, open orbits symmetrically about periapsis
+            out to radius r_max (see open_anomaly_limit).
+        """
+        if self.conic == 'elliptical':
+            v = np.linspace(0, 2*np.pi, n)
+        else:
+            nu_max = open_anomaly_limit(self.p, self.ecc, r_max)
+            v = np.linspace(-nu_max, nu_max, n)
+
+        r = self.p/(1 + self.ecc*np.cos(v))
+
+        return np.stack((r*np.cos(v), r*np.sin(v)), axis=-1).dot(self.dcm_pqw2eci[:, :2].T)
@@ -0,0 +1,197 @@
+"""Universal variable propagation for all conic types"""
+import warnings
+import numpy as np
+from keplerian_orbit.keplerian_orbit import kepler_eq_E_vec, nu2anom_vec
+
+def stumpff(psi_in):
+    """
+    (c2,c3) = stumpff(psi)
+    Purpose:
+       - Compute the Stumpff functions c2 and c3 used by the universal
+       variable formulation. Works on arrays of psi of any shape and for
+       elliptical (psi > 0), parabolic (psi = 0) and hyperbolic (psi < 0)
+       values in the same array.
+
+    Inputs:
+       - psi - universal variable squared times 1/a (chi^2 * alpha)
+
+    Outputs:
+       - c2 - (1 - cos(sqrt(psi)))/psi
+       - c3 - (sqrt(psi) - sin(sqrt(psi)))/sqrt(psi^3)
+
+    References
+       - Vallado 3rd Ed Algorithm 1
+    """
+    psi = np.asarray(psi_in, dtype=float)
+    small = 1e-6
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        sq_ell = np.sqrt(np.where(psi > small, psi, 1.0))
+        sq_hyp = np.sqrt(np.where(psi < -small, -psi, 1.0))
+
+        c2 = np.where(psi > small, (1.0 - np.cos(sq_ell))/psi,
+                      np.where(psi < -small, (np.cosh(sq_hyp) - 1.0)/-psi,
+                               0.5 - psi/24.0))
+        c3 = np.where(psi > small, (sq_ell - np.sin(sq_ell))/(sq_ell*psi),
+                      np.where(psi < -small, (np.sinh(sq_hyp) - sq_hyp)/(-sq_hyp*psi),
+                               1.0/6.0 - psi/120.0))
+
+    return (c2, c3)
+
+def universal_propagate(r0_in, v0_in, mu, delta_t, tol=1e-9, max_iter=50):
+    """
+    (r,v) = universal_propagate(r0,v0,mu,delta_t)
+    Purpose:
+       - Propagate position and velocity vectors forward by delta_t with
+       the universal variable formulation. The same vectorized newton
+       iteration is used for elliptical, parabolic and hyperbolic states,
+       so mixed populations can be propagated together.
+
+       Elliptical and hyperbolic elements are seeded from the change in
+       eccentric (hyperbolic) anomaly found with kepler_eq_E_vec, which
+       stays accurate for near parabolic orbits where the usual seeds are
+       far from the solution. Elements that do not converge in max_iter
+       iterations raise a RuntimeWarning.
+
+    Inputs:
+       - r0 - (N,3) or (3,) initial position vectors
+       - v0 - (N,3) or (3,) initial velocity vectors
+       - mu - gravitational parameter (consistent units)
+       - delta_t - time of flight, scalar or (N,) array (sec)
+       - tol - convergence tolerance on the universal variable
+       - max_iter - maximum number of newton iterations
+
+    Outputs:
+       - r - (N,3) position vectors after delta_t
+       - v - (N,3) velocity vectors after delta_t
+
+    References
+       - Vallado 3rd Ed Algorithm 8
+    """
+    r0_vec = np.atleast_2d(np.asarray(r0_in, dtype=float))
+    v0_vec = np.atleast_2d(np.asarray(v0_in, dtype=float))
+    r0_vec, v0_vec = np.broadcast_arrays(r0_vec, v0_vec)
+    dt = np.broadcast_to(np.asarray(delta_t, dtype=float), r0_vec.shape[:-1])
+
+    small = 1e-6
+    sqrt_mu = np.sqrt(mu)
+
+    r0 = np.sqrt(np.sum(r0_vec**2, axis=-1))
+    v0 = np.sqrt(np.sum(v0_vec**2, axis=-1))
+    rdotv = np.sum(r0_vec*v0_vec, axis=-1)
+    alpha = -v0*v0/mu + 2.0/r0 # 1/a
+
+    ell = alpha > small
+    hyp = alpha < -small
+    par = ~ell & ~hyp
+
+    with np.errstate(invalid='ignore', divide='ignore', over='ignore'):
+        # reduce elliptical times of flight to within one period
+        period = 2*np.pi*np.sqrt(1.0/np.absolute(alpha)**3/mu)
+        dt = np.where(ell, np.fmod(dt, period), dt)
+
+        # initial guess for each conic type, the closed conics use
+        # chi = sqrt(a) (E - E_0) and chi = sqrt(-a) (H - H_0)
+        chi_ell = _anomaly_seed(r0, rdotv, alpha, dt, mu, ell)
+        chi_hyp = _anomaly_seed(r0, rdotv, alpha, dt, mu, hyp)
+
+        h = np.sqrt(np.sum(np.cross(r0_vec, v0_vec)**2, axis=-1))
+        p = h*h/mu
+        s = 0.5*(np.pi/2 - np.arctan(3.0*np.sqrt(mu/p**3)*dt))
+        w = np.arctan(np.cbrt(np.tan(s)))
+        chi_par = np.sqrt(p)*2.0/np.tan(2.0*w)
+
+    chi = np.where(ell, chi_ell, np.where(hyp, chi_hyp, chi_par))
+    chi = np.where((dt == 0.0) | ~np.isfinite(chi), 0.0, chi)
+
+    # newton iteration for the universal variable over all elements
+    active = np.ones(chi.shape, dtype=bool)
+    count = 0
+    while active.any() and count < max_iter:
+        psi = chi*chi*alpha
+        c2, c3 = stumpff(psi)
+        r = chi*chi*c2 + rdotv/sqrt_mu*chi*(1.0 - psi*c3) + r0*(1.0 - psi*c2)
+        delta = (sqrt_mu*dt - chi**3*c3 - rdotv/sqrt_mu*chi*chi*c2
+                 - r0*chi*(1.0 - psi*c3)) / r
+        delta = np.where(active, delta, 0.0)
+        chi = chi + delta
+        active = active & (np.absolute(delta) > tol)
+        count = count + 1
+
+    failed = np.count_nonzero(active | ~np.isfinite(chi))
+    if failed:
+        warnings.warn("universal_propagate: %d elements did not converge in %d iterations"
+                      % (failed, max_iter), RuntimeWarning)
+
+    # f and g functions
+    psi = chi*chi*alpha
+    c2, c3 = stumpff(psi)
+    r = chi*chi*c2 + rdotv/sqrt_mu*chi*(1.0 - psi*c3) + r0*(1.0 - psi*c2)
+
+    f = 1.0 - chi*chi/r0*c2
+    g = dt - chi**3/sqrt_mu*c3
+    gdot = 1.0 - chi*chi/r*c2
+    fdot = sqrt_mu/(r*r0)*chi*(psi*c3 - 1.0)
+
+    r_vec = f[..., np.newaxis]*r0_vec + g[..., np.newaxis]*v0_vec
+    v_vec = fdot[..., np.newaxis]*r0_vec + gdot[..., np.newaxis]*v0_vec
+
+    return (r_vec, v_vec)
+
+def _anomaly_seed(r0, rdotv, alpha, dt, mu, mask):
+    """
+        Universal variable of the elements in mask (all elliptical or all
+        hyperbolic) from a Kepler equation solve, nan elsewhere
+    """
+    chi = np.full(r0.shape, np.nan)
+    if not mask.any():
+        return chi
+
+    r0, rdotv, alpha, dt = r0[mask], rdotv[mask], alpha[mask], dt[mask]
+    ecos = 1.0 - r0*alpha
+    esin = rdotv*np.sqrt(np.absolute(alpha)/mu)
+    n = np.sqrt(mu*np.absolute(alpha)**3)
+
+    if alpha[0] > 0:
+        ecc = np.sqrt(ecos*ecos + esin*esin)
+        E_0 = np.arctan2(esin, ecos)
+        M = E_0 - esin + n*dt
+    else:
+        ecc = np.sqrt(ecos*ecos - esin*esin)
+        E_0 = np.arcsinh(esin/ecc)
+        M = esin - E_0 + n*dt
+
+    E = kepler_eq_E_vec(M, ecc, tol=1e-12, method='halley')[0]
+    chi[mask] = (E - E_0)/np.sqrt(np.absolute(alpha))
+
+    return chi
+
+def tof_universal(p,ecc,mu,nu_0,delta_t):
+    """
+        Propogate a COE into the future with the universal variable engine
+
+        Same outputs as tof_delta_t but p, ecc, nu_0 and delta_t may all be
+        arrays (broadcast together) and elliptical, parabolic and
+        hyperbolic orbits are handled by one code path. The perifocal state
+        is propagated and the final true anomaly is read off the position.
+    """
+    p, ecc, nu_0, delta_t = np.broadcast_arrays(np.asarray(p, dtype=float),
+                                                np.asarray(ecc, dtype=float),
+                                                np.asarray(nu_0, dtype=float),
+                                                np.asarray(delta_t, dtype=float))
+    shape = p.shape
+
+    cosnu = np.cos(nu_0).ravel()
+    sinnu = np.sin(nu_0).ravel()
+    radius = p.ravel()/(1.0 + ecc.ravel()*cosnu)
+    zero = np.zeros_like(cosnu)
+
+    r_pqw = radius[:, np.newaxis]*np.stack((cosnu, sinnu, zero), axis=-1)
+    v_pqw = np.sqrt(mu/p.ravel())[:, np.newaxis]*np.stack((-sinnu, ecc.ravel() + cosnu, zero), axis=-1)
+
+    r_f, v_f = universal_propagate(r_pqw, v_pqw, mu, delta_t.ravel())
+
+    nu_f = np.arctan2(r_f[:, 1], r_f[:, 0]).reshape(shape)
+    E_f, M_f = nu2anom_vec(nu_f, ecc)
+
+    return (E_f, M_f, nu_f)
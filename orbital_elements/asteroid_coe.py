@@ -1,81 +1,199 @@
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED, ALL_COMPLETED
 import numpy as np
-from keplerian_orbit.keplerian_orbit import tof_delta_t, kepler_eq_E
+from keplerian_orbit.keplerian_orbit import kepler_eq_E, kepler_eq_E_vec
+from keplerian_orbit.coe import coe2rv_vec
 from utilities.attitude import normalize
+from orbital_elements.catalog import builtin_catalog
 
-def asteroid_epoch(ast_flag):
+def asteroid_epoch(ast_flag, catalog=builtin_catalog):
     """
         This holds the orbital elements for the asteroids as taken from JPL
 
         Return the state at the JD epoch for use in a propogate function
+
+        ast_flag is the catalog row (0 - 2008 EV5, 1 - Itokawa, 2 - Bennu in
+        the built-in catalog) or the name of the asteroid. Any
+        AsteroidCatalog, e.g. from load_mpcorb, may be passed as catalog.
     """
 
-    if ast_flag == 0:
-        # 2008 EV5
-        a = 0.9582899238313918
-        ecc = 0.08348599378460778    
-        p =  a * (1-ecc**2)
-        inc = np.deg2rad(7.436787362690259)
-        raan = np.deg2rad(93.39122898787916)
-        argp = np.deg2rad(234.8245876826614)
-        M = np.deg2rad(3.409187469072454)
-        JD_epoch = 2457800.5
-    elif ast_flag == 1:
-        # Itokawa
-        a = 1.324163617639197
-        ecc = 0.28011765678781    
-        p =  a * (1-ecc**2)
-        inc = np.deg2rad(1.62145641293925)
-        raan = np.deg2rad(69.07992986350325)
-        argp = np.deg2rad(162.8034822691509)
-        M = np.deg2rad(131.4340297670125)
-        JD_epoch = 2457800.5
-    elif ast_flag == 2:
-        # Bennu
-        a = 1.126391026007489
-        ecc = 0.2037451112033579    
-        p =  a * (1-ecc**2)
-        inc = np.deg2rad(6.034939195483961)
-        raan = np.deg2rad(2.060867837066797)
-        argp = np.deg2rad(66.22306857848962)
-        M = np.deg2rad(101.7039476994243)
-        JD_epoch = 2455562.5
+    return catalog.epoch(_catalog_row(ast_flag, catalog))
+
+def _catalog_row(ast_flag, catalog):
+    """Catalog row of an asteroid flag (row number) or name"""
+    if isinstance(ast_flag, str):
+        return catalog.index(ast_flag)
+    elif 0 <= ast_flag < len(catalog):
+        return ast_flag
     else:
-        print("No such asteroid defined yet. Using Itokawa so nothing breaks instead")
+        raise ValueError("Incorrect asteroid flag should be between 0 and %d" % (len(catalog) - 1))
 
-        # Itokawa
-        a = 1.324163617639197
-        ecc = 0.28011765678781    
-        p =  a * (1-ecc**2)
-        inc = np.deg2rad(1.62145641293925)
-        raan = np.deg2rad(69.07992986350325)
-        argp = np.deg2rad(162.8034822691509)
-        M = np.deg2rad(131.4340297670125)
-        JD_epoch = 2457800.5
+def asteroid_coe(JD_curr,ast_flag,catalog=builtin_catalog):
+    """
+        Output the current COE for the chosen asteroid
 
-    # convert M to nu for later and output the coe
-    E, nu, count = kepler_eq_E(M,ecc)
+        The mean anomaly and mean motion are read straight from the
+        catalog, so only one Kepler solve is needed per call.
+    """
 
-    epoch = (p,ecc,inc,raan,argp,normalize(nu,0,2*np.pi),JD_epoch)
+    row = _catalog_row(ast_flag, catalog)
+    ecc = catalog.ecc[row]
 
-    return epoch
+    # compute the delta t
+    delta_t = (JD_curr - catalog.JD_epoch[row]) * 86400
 
-def asteroid_coe(JD_curr,ast_flag):
+    # propogate the mean anomaly to the current JD_curr
+    M_f = catalog.M[row] + catalog.n[row] * delta_t
+    if ecc < 1:
+        M_f = M_f - 2*np.pi*np.floor(M_f/(2*np.pi))
+    (E_f, nu_f, count) = kepler_eq_E(M_f, ecc)
+
+    # output the current COE
+    coe = (catalog.p[row],ecc,catalog.inc[row],catalog.raan[row],catalog.argp[row],normalize(nu_f,0,2*np.pi))
+
+    return coe
+
+def asteroids_coe(JD_curr, catalog, rows=None):
     """
-        Output the current COE for the chosen asteroid
+        Output the current COE for many asteroids of a catalog at once
+
+        coe = asteroids_coe(JD_curr, catalog, rows=None)
+
+        The element columns are read straight from the catalog, so they may
+        be the np.memmap columns of open_catalog, and only the selected
+        rows (index array, slice or mask, default all) are touched. The
+        mean anomaly is advanced from the catalog value and Kepler's
+        equation is solved once for all of them with kepler_eq_E_vec.
+        Returns an (N, 6) array with the columns (p,ecc,inc,raan,argp,nu).
     """
+    if rows is None:
+        rows = slice(None)
+
+    ecc = np.asarray(catalog.ecc[rows], dtype=float)
+    nu_f = _propagate_nu(JD_curr, catalog, rows, ecc)
 
-    # load the asteroid COE at the epoch
-    (p,ecc,inc,raan,argp,nu_0, JD_epoch) = asteroid_epoch(ast_flag)
+    coe = np.stack((catalog.p[rows], ecc, catalog.inc[rows], catalog.raan[rows],
+                    catalog.argp[rows], normalize(nu_f,0,2*np.pi)), axis=-1)
 
+    return coe
+
+def _propagate_nu(JD_curr, catalog, rows, ecc):
+    """True anomaly at JD_curr of the selected catalog rows"""
     # compute the delta t
-    delta_t = (JD_curr - JD_epoch) * 86400
+    delta_t = (JD_curr - np.asarray(catalog.JD_epoch[rows], dtype=float)) * 86400
+
+    # advance the mean anomaly, wrapping the closed orbits
+    M_f = catalog.M[rows] + catalog.n[rows] * delta_t
+    M_f = np.where(ecc < 1, M_f - 2*np.pi*np.floor(M_f/(2*np.pi)), M_f)
+
+    E_f, nu_f, count = kepler_eq_E_vec(M_f, ecc)
+
+    return nu_f
+
+def asteroids_rv(JD_curr, catalog, rows=None):
+    """
+        Heliocentric position and velocity of many asteroids at once
+
+        (r,v) = asteroids_rv(JD_curr, catalog, rows=None)
+
+        Same propagation as asteroids_coe, then the perifocal state is
+        rotated with the catalog PQW to ECI matrices. The few circular or
+        equatorial rows go through coe2rv_vec instead, so every row matches
+        coe2rv of the propagated elements. Returns (N,3) arrays in au and
+        au/sec.
+    """
+    if rows is None:
+        rows = slice(None)
+
+    ecc = np.asarray(catalog.ecc[rows], dtype=float)
+    p = np.asarray(catalog.p[rows], dtype=float)
+    nu_f = _propagate_nu(JD_curr, catalog, rows, ecc)
+
     mu = 1.32712440018e20 # m^3 / s^2
     mu = 1/149597870700**3 * mu # au^3 / sec^2
 
-    # propogate to the current JD_curr
-    (E_f, M_f, nu_f) = tof_delta_t(p,ecc,mu,nu_0,delta_t)
+    cosnu = np.cos(nu_f)
+    sinnu = np.sin(nu_f)
+    radius = p/(1 + ecc*cosnu)
+    sqrt_mu_p = np.sqrt(mu/p)
 
-    # output the current COE
-    coe = (p,ecc,inc,raan,argp,normalize(nu_f,0,2*np.pi))
+    dcm = catalog.dcm_pqw2eci[rows]
+    r = dcm[:, :, 0]*(radius*cosnu)[:, np.newaxis] + dcm[:, :, 1]*(radius*sinnu)[:, np.newaxis]
+    v = (dcm[:, :, 0]*(-sqrt_mu_p*sinnu)[:, np.newaxis]
+         + dcm[:, :, 1]*(sqrt_mu_p*(ecc + cosnu))[:, np.newaxis])
+
+    # circular and equatorial orbits redefine the angles, same test as coe2rv
+    tol = 1e-9
+    inc = np.asarray(catalog.inc[rows], dtype=float)
+    special = np.flatnonzero((ecc < tol) | (inc < tol) | (np.absolute(inc - np.pi) < tol))
+    if special.shape[0] > 0:
+        raan = np.asarray(catalog.raan[rows], dtype=float)[special]
+        argp = np.asarray(catalog.argp[rows], dtype=float)[special]
+        r[special], v[special] = coe2rv_vec(p[special], ecc[special], inc[special], raan, argp,
+                                            nu_f[special], mu)[:2]
+
+    return (r, v)
+
+def _propagate_chunk(JD, catalog):
+    """Elements of every row of a (chunk) catalog at each JD, (T, N, 6)"""
+    return np.stack([asteroids_coe(JD_curr, catalog) for JD_curr in JD])
+
+def propagate_catalog(JD, catalog, chunk_size=65536, workers=None, out=None, dtype=float):
+    """
+        Propagate a whole catalog to one epoch or a list of epochs
+
+        coe = propagate_catalog(JD, catalog)
+
+        The catalog is processed in chunks of chunk_size rows with
+        asteroids_coe and each chunk is written into a preallocated output
+        array, so the working memory is bounded by the chunk size. With
+        workers > 1 the chunks are spread over a ProcessPoolExecutor; only
+        the rows of a chunk are sent to a worker and at most two chunks per
+        worker are in flight at a time.
+
+        Inputs:
+           - JD - scalar JD or sequence of T epochs
+           - catalog - AsteroidCatalog, e.g. the memory mapped one from
+           open_catalog
+           - chunk_size - rows per chunk
+           - workers - number of processes (default: run in this process)
+           - out - optional preallocated (N,6) or (T,N,6) output
+           - dtype - dtype of the output when out is not given
+
+        Outputs:
+           - coe - (N,6) for a scalar JD, (T,N,6) for a sequence, columns
+           (p,ecc,inc,raan,argp,nu)
+    """
+    JD_list = np.atleast_1d(np.asarray(JD, dtype=float))
+    N = len(catalog)
+    shape = (JD_list.shape[0], N, 6) if np.ndim(JD) > 0 else (N, 6)
+
+    if out is None:
+        out = np.empty(shape, dtype=dtype)
+    elif out.shape != shape:
+        raise ValueError("out must have shape %r" % (shape,))
+    # epochs always along the first axis of the view
+    out_view = out if np.ndim(JD) > 0 else out[np.newaxis]
+
+    chunks = [(start, min(start + chunk_size, N)) for start in range(0, N, chunk_size)]
+
+    if workers is None or workers <= 1:
+        for start, stop in chunks:
+            out_view[:, start:stop] = _propagate_chunk(JD_list, catalog.subset(slice(start, stop)))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = {}
+            for start, stop in chunks:
+                future = pool.submit(_propagate_chunk, JD_list, catalog.subset(slice(start, stop)))
+                pending[future] = (start, stop)
+                if len(pending) >= 2*workers:
+                    _collect(pending, out_view, wait_all=False)
+            _collect(pending, out_view, wait_all=True)
+
+    return out
 
-    return coe
\ No newline at end of file
+def _collect(pending, out_view, wait_all):
+    """Copy finished chunks into the output and drop them from pending"""
+    done, not_done = wait(list(pending), return_when=ALL_COMPLETED if wait_all else FIRST_COMPLETED)
+    for future in done:
+        start, stop = pending.pop(future)
+        out_view[:, start:stop] = future.result()
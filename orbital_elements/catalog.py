@@ -0,0 +1,397 @@
+"""Columnar asteroid element catalogs loaded from MPCORB or SBDB files"""
+import csv
+import json
+import os
+import numpy as np
+from utilities.attitude import normalize, pqw_to_inertial
+from utilities.time import date2jd
+from keplerian_orbit.keplerian_orbit import kepler_eq_E
+
+class AsteroidCatalog(object):
+    """
+        Asteroid elements held as one NumPy array per element
+
+        catalog = load_mpcorb('MPCORB.DAT')
+        row = catalog.index('Bennu')
+        epoch = catalog.epoch(row)
+
+        Attributes (all arrays of length N):
+           - number - asteroid number, -1 for unnumbered objects
+           - name - name or provisional designation
+           - a - semi-major axis (au)
+           - ecc - eccentricity
+           - inc - inclination (rad)
+           - raan - right ascension of the ascending node (rad)
+           - argp - argument of periapsis (rad)
+           - M - mean anomaly at the epoch (rad)
+           - JD_epoch - JD of the osculating elements
+
+        Derived invariants (computed on first use, or read from the files
+        written by save_catalog):
+           - p - semi-latus rectum (au)
+           - n - mean motion (rad/sec)
+           - dcm_pqw2eci - (N,3,3) perifocal to inertial rotations
+    """
+
+    __slots__ = ('number', 'name', 'a', 'ecc', 'inc', 'raan', 'argp', 'M', 'JD_epoch',
+                 '_number_order', '_name_order', '_p', '_n', '_dcm_pqw2eci')
+
+    columns = ('number', 'name', 'a', 'ecc', 'inc', 'raan', 'argp', 'M', 'JD_epoch')
+
+    def __init__(self, number, name, a, ecc, inc, raan, argp, M, JD_epoch):
+        self.number = np.asanyarray(number, dtype=np.int64)
+        self.name = np.asanyarray(name)
+        if self.name.dtype.kind not in 'SU':
+            self.name = self.name.astype(str)
+        self.a = np.asanyarray(a, dtype=float)
+        self.ecc = np.asanyarray(ecc, dtype=float)
+        self.inc = np.asanyarray(inc, dtype=float)
+        self.raan = np.asanyarray(raan, dtype=float)
+        self.argp = np.asanyarray(argp, dtype=float)
+        self.M = np.asanyarray(M, dtype=float)
+        self.JD_epoch = np.asanyarray(JD_epoch, dtype=float)
+
+        self._number_order = None
+        self._name_order = None
+        self._p = None
+        self._n = None
+        self._dcm_pqw2eci = None
+
+    def __len__(self):
+        return self.a.shape[0]
+
+    def __repr__(self):
+        return "AsteroidCatalog(%d objects)" % len(self)
+
+    def subset(self, rows):
+        """New catalog holding only the selected rows (index, slice or mask)"""
+        catalog = AsteroidCatalog(*[getattr(self, column)[rows] for column in self.columns])
+        for invariant in ('_p', '_n', '_dcm_pqw2eci'):
+            values = getattr(self, invariant)
+            if values is not None:
+                setattr(catalog, invariant, values[rows])
+
+        return catalog
+
+    @property
+    def p(self):
+        """Semi-latus rectum (au) of every object"""
+        if self._p is None:
+            self._p = self.a*(1 - self.ecc**2)
+        return self._p
+
+    @property
+    def n(self):
+        """Mean motion (rad/sec) of every object about the sun"""
+        if self._n is None:
+            mu = 1.32712440018e20 # m^3 / s^2
+            mu = 1/149597870700**3 * mu # au^3 / sec^2
+            self._n = np.sqrt(mu/np.absolute(self.a)**3)
+        return self._n
+
+    @property
+    def dcm_pqw2eci(self):
+        """(N,3,3) perifocal to inertial rotation of every object"""
+        if self._dcm_pqw2eci is None:
+            self._dcm_pqw2eci = pqw_to_inertial(self.raan, self.inc, self.argp)
+        return self._dcm_pqw2eci
+
+    def index(self, key):
+        """
+            Row of the object with the given number (int) or name (str)
+
+            The sorted orders used for the search are built on the first
+            lookup. Raises KeyError if the object is not in the catalog.
+        """
+        if isinstance(key, (int, np.integer)):
+            if self._number_order is None:
+                self._number_order = np.argsort(self.number, kind='stable')
+            values, order = self.number, self._number_order
+        else:
+            if self._name_order is None:
+                self._name_order = np.argsort(self.name, kind='stable')
+            values, order = self.name, self._name_order
+            if values.dtype.kind == 'S': # names stored as utf-8 bytes on disk
+                key = key.encode('utf-8')
+
+        idx = np.searchsorted(values, key, sorter=order)
+        if idx < order.shape[0] and values[order[idx]] == key:
+            return int(order[idx])
+        else:
+            raise KeyError("No asteroid %r in the catalog" % (key,))
+
+    def epoch(self, row):
+        """
+            Return the state at the JD epoch for use in a propogate function
+
+            Same tuple as asteroid_epoch, (p,ecc,inc,raan,argp,nu,JD_epoch)
+        """
+        ecc = self.ecc[row]
+        E, nu, count = kepler_eq_E(self.M[row], ecc)
+
+        return (self.p[row], ecc, self.inc[row], self.raan[row],
+                self.argp[row], normalize(nu,0,2*np.pi), self.JD_epoch[row])
+
+def _split_designation(designation):
+    """Split readable designations like '(101955) Bennu' into number and name"""
+    designation = np.char.strip(designation)
+    numbered = np.char.startswith(designation, '(')
+    parts = np.char.partition(np.char.lstrip(designation, '('), ')')
+
+    number = np.where(numbered, parts[:, 0], '-1')
+    number = np.where(np.char.isdigit(number) | (number == '-1'), number, '-1').astype(np.int64)
+    name = np.where(numbered, np.char.strip(parts[:, 2]), designation)
+
+    return (number, name)
+
+# packed MPC digits: 1-9 then A=10 ... V=31 (centuries I=18, J=19, K=20)
+_packed_digit = np.zeros(128, dtype=np.int64)
+for _k, _c in enumerate('123456789ABCDEFGHIJKLMNOPQRSTUV'):
+    _packed_digit[ord(_c)] = _k + 1
+
+def unpack_epoch(packed):
+    """
+        JD of MPC packed epochs like 'K2555' (2025 May 5.0 TT)
+
+        Works on an array of packed strings (or bytes) at once.
+    """
+    codes = np.asarray(packed, dtype='S5').view(np.uint8).reshape(-1, 5)
+
+    yr = 100*_packed_digit[codes[:, 0]] + 10*(codes[:, 1] - ord('0')) + (codes[:, 2] - ord('0'))
+    mon = _packed_digit[codes[:, 3]]
+    day = _packed_digit[codes[:, 4]]
+
+    JD, MJD = date2jd(yr, mon, day, 0, 0, 0)
+
+    return JD.reshape(np.shape(packed))
+
+def load_mpcorb(filename):
+    """
+        Load an MPCORB.DAT style fixed width element file
+
+        catalog = load_mpcorb(filename)
+
+        The header (everything before the line of dashes, if there is one)
+        and blank lines are skipped. The remaining lines are stacked into a
+        byte array and every element column is sliced and converted for all
+        objects at once.
+    """
+    with open(filename, 'rb') as f:
+        lines = f.read().splitlines()
+
+    for k, line in enumerate(lines):
+        if line.startswith(b'-----'):
+            lines = lines[k+1:]
+            break
+
+    lines = [line for line in lines if len(line.rstrip()) >= 103]
+    if not lines:
+        return AsteroidCatalog(*[[]]*9)
+
+    width = max(202, max(len(line) for line in lines))
+    chars = np.array(lines, dtype='S%d' % width).view('S1').reshape(len(lines), width)
+
+    def column(start, end):
+        """Columns start-end (1 based, inclusive) of every line"""
+        return np.ascontiguousarray(chars[:, start-1:end]).view('S%d' % (end - start + 1)).ravel()
+
+    number, name = _split_designation(np.char.decode(column(167, 194)))
+
+    return AsteroidCatalog(number, name,
+                           a=column(93, 103).astype(float),
+                           ecc=column(71, 79).astype(float),
+                           inc=np.deg2rad(column(60, 68).astype(float)),
+                           raan=np.deg2rad(column(49, 57).astype(float)),
+                           argp=np.deg2rad(column(38, 46).astype(float)),
+                           M=np.deg2rad(column(27, 35).astype(float)),
+                           JD_epoch=unpack_epoch(column(21, 25)))
+
+def load_sbdb_csv(filename):
+    """
+        Load a JPL Small-Body Database CSV export
+
+        catalog = load_sbdb_csv(filename)
+
+        The header row must name the columns e, a, i, om, w, ma and epoch
+        (JD) and either full_name or pdes (name is used when present).
+        Angles are in degrees. The rows are read with the csv module and
+        each column is converted in one call.
+    """
+    with open(filename, newline='') as f:
+        reader = csv.reader(f)
+        header = [field.strip() for field in next(reader)]
+        rows = [row for row in reader if row]
+
+    table = np.array(rows, dtype=str).reshape(len(rows), len(header))
+    col = dict((field, k) for k, field in enumerate(header))
+
+    def floats(field):
+        values = np.char.strip(table[:, col[field]])
+        return np.where(values == '', 'nan', values).astype(float)
+
+    if 'full_name' in col:
+        # full_name is '101955 Bennu (1999 RQ36)', '341843 (2008 EV5)' or '(2019 AB)'
+        full_name = np.char.strip(table[:, col['full_name']])
+        parts = np.char.partition(full_name, ' ')
+        numbered = np.char.isdigit(parts[:, 0])
+        number = np.where(numbered, parts[:, 0], '-1').astype(np.int64)
+        rest = np.char.strip(np.where(numbered, parts[:, 2], full_name))
+        name = np.where(np.char.startswith(rest, '('), np.char.strip(rest, '()'),
+                        np.char.partition(rest, ' (')[:, 0])
+    else:
+        pdes = np.char.strip(table[:, col['pdes']])
+        number = np.where(np.char.isdigit(pdes), pdes, '-1').astype(np.int64)
+        name = pdes
+    if 'name' in col:
+        given = np.char.strip(table[:, col['name']])
+        name = np.where(given != '', given, name)
+
+    return AsteroidCatalog(number, name,
+                           a=floats('a'),
+                           ecc=floats('e'),
+                           inc=np.deg2rad(floats('i')),
+                           raan=np.deg2rad(floats('om')),
+                           argp=np.deg2rad(floats('w')),
+                           M=np.deg2rad(floats('ma')),
+                           JD_epoch=floats('epoch'))
+
+# on disk format, one raw little endian array per column next to header.json
+_store_version = 2
+_store_dtypes = {'number': '<i8', 'a': '<f8', 'ecc': '<f8', 'inc': '<f8', 'raan': '<f8',
+                 'argp': '<f8', 'M': '<f8', 'JD_epoch': '<f8',
+                 'number_order': '<i8', 'name_order': '<i8',
+                 'p': '<f8', 'n': '<f8', 'dcm_pqw2eci': '<f8'}
+_store_shapes = {'dcm_pqw2eci': [3, 3]}
+
+def save_catalog(catalog, path, source=None):
+    """
+        Write a catalog to the memory mapped binary format
+
+        save_catalog(catalog, path)
+
+        path is a directory holding header.json (version, number of objects
+        and the dtype of every column) and one raw file per column, plus
+        the sorted number and name orders used by AsteroidCatalog.index so
+        lookups on the opened catalog do not have to sort. The derived
+        invariants (p, n and the PQW to ECI matrices) are stored as well so
+        propagation never recomputes them. Names are stored as fixed width
+        utf-8 bytes. source is an optional element file whose size and
+        modification time are recorded in the header (see load_catalog).
+    """
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    names = np.char.encode(np.asarray(catalog.name, dtype=str), 'utf-8')
+    if names.dtype.itemsize == 0:
+        names = names.astype('S1')
+
+    columns = dict((column, getattr(catalog, column)) for column in catalog.columns)
+    columns['name'] = names
+    columns['number_order'] = np.argsort(catalog.number, kind='stable')
+    columns['name_order'] = np.argsort(names, kind='stable')
+    columns['p'] = catalog.p
+    columns['n'] = catalog.n
+    columns['dcm_pqw2eci'] = catalog.dcm_pqw2eci
+
+    dtypes = dict(_store_dtypes)
+    dtypes['name'] = names.dtype.str
+
+    # replace the files rather than overwrite them, catalogs that are still
+    # open keep mapping the old data
+    for column, values in columns.items():
+        filename = os.path.join(path, column + '.bin')
+        np.ascontiguousarray(values, dtype=dtypes[column]).tofile(filename + '.tmp')
+        os.replace(filename + '.tmp', filename)
+
+    header = {'version': _store_version, 'count': len(catalog), 'dtypes': dtypes,
+              'shapes': _store_shapes}
+    if source is not None:
+        header['source'] = _source_stamp(source)
+    with open(os.path.join(path, 'header.json'), 'w') as f:
+        json.dump(header, f, indent=1, sort_keys=True)
+
+def open_catalog(path, mode='r'):
+    """
+        Open a catalog written by save_catalog without reading it
+
+        catalog = open_catalog(path)
+
+        Every column is an np.memmap of its file, so opening is near
+        instant and only the pages of the columns and rows that are used
+        are read from disk. mode is passed to np.memmap ('r' or 'r+').
+    """
+    with open(os.path.join(path, 'header.json')) as f:
+        header = json.load(f)
+
+    if header['version'] not in (1, _store_version):
+        raise ValueError("Unsupported catalog version %r" % (header['version'],))
+
+    count = header['count']
+    shapes = header.get('shapes', {})
+    columns = {}
+    for column, dtype in header['dtypes'].items():
+        shape = (count,) + tuple(shapes.get(column, ()))
+        if count == 0:
+            columns[column] = np.empty(shape, dtype=dtype)
+        else:
+            columns[column] = np.memmap(os.path.join(path, column + '.bin'), dtype=dtype,
+                                        mode=mode, shape=shape)
+
+    catalog = AsteroidCatalog(*[columns[column] for column in AsteroidCatalog.columns])
+    catalog._number_order = columns['number_order']
+    catalog._name_order = columns['name_order']
+    # version 1 files have no invariants, they are then computed on first use
+    catalog._p = columns.get('p')
+    catalog._n = columns.get('n')
+    catalog._dcm_pqw2eci = columns.get('dcm_pqw2eci')
+
+    return catalog
+
+def _source_stamp(source):
+    """Size and modification time identifying the state of an element file"""
+    stat = os.stat(source)
+    return {'path': os.path.abspath(source), 'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+def load_catalog(source, cache_dir=None):
+    """
+        Load an element file through a persisted binary cache
+
+        catalog = load_catalog('MPCORB.DAT')
+
+        The first call parses source (load_sbdb_csv for .csv files,
+        load_mpcorb otherwise) and writes the catalog with its derived
+        invariants to cache_dir (default source + '.cache'). Later calls
+        open the cache with open_catalog. The cache is rebuilt whenever the
+        size or modification time of source differs from the one recorded
+        in the cache header.
+    """
+    if cache_dir is None:
+        cache_dir = source + '.cache'
+
+    header_file = os.path.join(cache_dir, 'header.json')
+    if os.path.isfile(header_file):
+        with open(header_file) as f:
+            header = json.load(f)
+        stamp = _source_stamp(source)
+        if header.get('version') == _store_version and header.get('source') == stamp:
+            return open_catalog(cache_dir)
+
+    if source.lower().endswith('.csv'):
+        catalog = load_sbdb_csv(source)
+    else:
+        catalog = load_mpcorb(source)
+    save_catalog(catalog, cache_dir, source=source)
+
+    return open_catalog(cache_dir)
+
+# elements of the original asteroids as taken from JPL, row = ast_flag
+builtin_catalog = AsteroidCatalog(
+    number=[341843, 25143, 101955],
+    name=['2008 EV5', 'Itokawa', 'Bennu'],
+    a=[0.9582899238313918, 1.324163617639197, 1.126391026007489],
+    ecc=[0.08348599378460778, 0.28011765678781, 0.2037451112033579],
+    inc=np.deg2rad([7.436787362690259, 1.62145641293925, 6.034939195483961]),
+    raan=np.deg2rad([93.39122898787916, 69.07992986350325, 2.060867837066797]),
+    argp=np.deg2rad([234.8245876826614, 162.8034822691509, 66.22306857848962]),
+    M=np.deg2rad([3.409187469072454, 131.4340297670125, 101.7039476994243]),
+    JD_epoch=[2457800.5, 2457800.5, 2455562.5])
@@ -0,0 +1,183 @@
+"""Screening of catalog asteroids against the planets"""
+import numpy as np
+from keplerian_orbit.moid import moid_dcm
+from keplerian_orbit.coe import coe2rv_vec
+from orbital_elements.planet_coe import planet_coe, planets_coe
+from orbital_elements.asteroid_coe import asteroids_rv
+from orbital_elements.ephemeris import mu_sun
+from utilities.attitude import pqw_to_inertial
+
+# one row per close approach, speed is the relative speed (au/sec)
+close_approach_dtype = np.dtype([('row', np.int64), ('number', np.int64), ('JD', float),
+                                 ('dist', float), ('speed', float)])
+
+def catalog_moid(JD, catalog, planet_flag=2, rows=None, chunk_size=16384, **kwargs):
+    """
+        MOID of every catalog asteroid with a planet
+
+        (dist,nu_ast,nu_planet) = catalog_moid(JD, catalog, planet_flag=2)
+
+        The planet orbit is taken from planet_coe at JD (default planet is
+        the Earth-Moon barycenter). The asteroid semi-major axes,
+        eccentricities and PQW to ECI matrices are read from the catalog
+        (the persisted invariants for a catalog from load_catalog) in chunks
+        of chunk_size rows, so memory stays bounded for the full catalog.
+        Extra keyword arguments are passed to moid_dcm.
+
+        Outputs:
+           - dist - (N,) MOID (au), nan for open orbits
+           - nu_ast - (N,) asteroid true anomaly at the MOID (rad)
+           - nu_planet - (N,) planet true anomaly at the MOID (rad)
+    """
+    p, ecc, inc, raan, argp, nu = planet_coe(JD, planet_flag)
+    a_planet = p/(1 - ecc**2)
+    dcm_planet = pqw_to_inertial(raan, inc, argp)
+
+    index = np.arange(len(catalog))
+    if rows is not None:
+        index = index[rows]
+
+    N = index.shape[0]
+    dist = np.empty(N)
+    nu_ast = np.empty(N)
+    nu_planet = np.empty(N)
+
+    for start in range(0, N, chunk_size):
+        chunk = slice(start, start + chunk_size)
+        if rows is None:
+            sel = slice(start, min(start + chunk_size, N))
+        else:
+            sel = index[chunk]
+        dist[chunk], nu_ast[chunk], nu_planet[chunk] = moid_dcm(
+            catalog.a[sel], catalog.ecc[sel], catalog.dcm_pqw2eci[sel],
+            a_planet, ecc, dcm_planet, **kwargs)
+
+    return (dist, nu_ast, nu_planet)
+
+def find_close_approaches(JD_start, JD_end, catalog, planet_flag=2, dist_max=0.05, step_days=1.0,
+                          rows=None, chunk_size=4096, tol_days=1e-6, max_iter=50, moid_margin=1e-3):
+    """
+        Close approaches of catalog asteroids to a planet over a time window
+
+        events = find_close_approaches(JD_start, JD_end, catalog)
+
+        Objects whose MOID with the planet (at the middle of the window)
+        exceeds dist_max + moid_margin can never come that close and are
+        dropped first. The margin (au) covers the error of the MOID search
+        and the drift of the planet elements away from the middle of the
+        window, so objects near the threshold are still propagated.
+        The others are propagated in chunks of chunk_size objects over a
+        grid of step_days with asteroids_rv and the planet state from
+        planets_coe/coe2rv_vec. A minimum of the distance lies wherever the
+        range-rate (relative position dotted with relative velocity)
+        changes sign from negative to positive between two grid epochs.
+        All brackets are refined together with a vectorized Illinois
+        (modified regula falsi) iteration until they are shorter than
+        tol_days. Minima closer than dist_max are returned.
+
+        The step must be short compared to the encounter so no two minima
+        fall in the same bracket; minima at the ends of the window (no sign
+        change inside it) are not reported.
+
+        Outputs:
+           - events - structured array with close_approach_dtype sorted by
+           JD: catalog row, asteroid number, JD, distance (au) and relative
+           speed (au/sec) at the minimum
+    """
+    index = np.arange(len(catalog))
+    if rows is not None:
+        index = index[rows]
+
+    # objects that can not come closer than dist_max
+    dist_moid = catalog_moid(0.5*(JD_start + JD_end), catalog, planet_flag, rows=index)[0]
+    index = index[~(dist_moid > dist_max + moid_margin)]
+
+    JD_grid = np.arange(JD_start, JD_end + 0.5*step_days, step_days)
+    r_planet, v_planet = _planet_rv(JD_grid, planet_flag)
+
+    events = []
+    for start in range(0, index.shape[0], chunk_size):
+        chunk = index[start:start + chunk_size]
+
+        # bracket the sign changes of the range-rate on the coarse grid
+        bracket_obj = []
+        bracket_step = []
+        rdot_prev = None
+        for k, JD in enumerate(JD_grid):
+            r, v = asteroids_rv(JD, catalog, rows=chunk)
+            rdot = np.einsum('ij,ij->i', r - r_planet[k], v - v_planet[k])
+            if rdot_prev is not None:
+                found = np.flatnonzero((rdot_prev < 0) & (rdot >= 0))
+                bracket_obj.append(found)
+                bracket_step.append(np.full(found.shape, k - 1))
+            rdot_prev = rdot
+
+        if not bracket_obj:
+            continue
+        obj = chunk[np.concatenate(bracket_obj)]
+        step = np.concatenate(bracket_step)
+        if obj.shape[0] == 0:
+            continue
+
+        JD_min, dist, speed = _refine_minimum(catalog, planet_flag, obj, JD_grid[step], JD_grid[step + 1],
+                                              tol_days, max_iter)
+
+        close = dist <= dist_max
+        event = np.empty(np.count_nonzero(close), dtype=close_approach_dtype)
+        event['row'] = obj[close]
+        event['number'] = catalog.number[obj[close]]
+        event['JD'] = JD_min[close]
+        event['dist'] = dist[close]
+        event['speed'] = speed[close]
+        events.append(event)
+
+    if not events:
+        return np.empty(0, dtype=close_approach_dtype)
+
+    events = np.concatenate(events)
+    return events[np.argsort(events['JD'], kind='stable')]
+
+def _planet_rv(JD, planet_flag):
+    """Heliocentric (T,3) position and velocity of a planet at an array of JD"""
+    coe = planets_coe(JD, planet_flags=planet_flag)
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv_vec(*coe.T, mu=mu_sun)
+    return (R_ijk, V_ijk)
+
+def _relative_state(catalog, planet_flag, obj, JD):
+    """Asteroid minus planet position and velocity at one JD per object"""
+    r, v = asteroids_rv(JD, catalog, rows=obj)
+    r_planet, v_planet = _planet_rv(JD, planet_flag)
+    return (r - r_planet, v - v_planet)
+
+def _refine_minimum(catalog, planet_flag, obj, JD_lo, JD_hi, tol_days, max_iter):
+    """Illinois iteration for the zero of the range-rate inside each bracket"""
+    def range_rate(JD):
+        r, v = _relative_state(catalog, planet_flag, obj, JD)
+        return np.einsum('ij,ij->i', r, v)
+
+    f_lo = range_rate(JD_lo)
+    f_hi = range_rate(JD_hi)
+    JD_lo = JD_lo.copy()
+    JD_hi = JD_hi.copy()
+    side = np.zeros(obj.shape, dtype=int)
+
+    for count in range(max_iter):
+        if np.all(JD_hi - JD_lo < tol_days):
+            break
+        with np.errstate(invalid='ignore', divide='ignore'):
+            JD_new = (JD_lo*f_hi - JD_hi*f_lo)/(f_hi - f_lo)
+        JD_new = np.where(np.isfinite(JD_new), JD_new, 0.5*(JD_lo + JD_hi))
+        f_new = range_rate(JD_new)
+
+        # keep the bracket, halving the value at an end kept twice in a row
+        upper = f_new >= 0
+        JD_hi = np.where(upper, JD_new, JD_hi)
+        f_hi = np.where(upper, f_new, np.where(side == -1, 0.5*f_hi, f_hi))
+        JD_lo = np.where(upper, JD_lo, JD_new)
+        f_lo = np.where(upper, np.where(side == 1, 0.5*f_lo, f_lo), f_new)
+        side = np.where(upper, 1, -1)
+
+    JD_min = np.where(np.absolute(f_lo) < np.absolute(f_hi), JD_lo, JD_hi)
+    r, v = _relative_state(catalog, planet_flag, obj, JD_min)
+
+    return (JD_min, np.sqrt(np.sum(r**2, axis=1)), np.sqrt(np.sum(v**2, axis=1)))
@@ -0,0 +1,120 @@
+"""Opt-in LRU cache for the element functions keyed by quantized JD"""
+from collections import OrderedDict, namedtuple
+from orbital_elements.planet_coe import planet_coe
+from orbital_elements.asteroid_coe import asteroid_coe
+from orbital_elements.catalog import builtin_catalog
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+class ElementCache(object):
+    """
+        Least recently used cache around planet_coe or asteroid_coe
+
+        cached_coe = ElementCache(planet_coe, quantum=1.0/1440)
+        (p,ecc,inc,raan,argp,nu) = cached_coe(JD_curr, planet_flag)
+
+        The JD is rounded to a multiple of quantum (days) and the wrapped
+        function is evaluated at that rounded JD, so every request inside
+        the same quantum returns the identical element set no matter which
+        request filled the entry. quantum=None keys on the exact JD.
+
+        Extra positional arguments (like the catalog of asteroid_coe) are
+        passed on to coe_func and are part of the key, so entries of
+        different catalogs never mix. They are compared by identity and the
+        cache keeps a reference to them. Calls without them use args.
+
+        Inputs:
+           - coe_func - function of (JD, flag, *args) returning the element tuple
+           - quantum - JD resolution of the cache in days (default 1 sec)
+           - maxsize - number of entries kept before the least recently
+           used one is evicted
+           - args - tuple of extra arguments used when a call passes none
+
+        cache_info() returns the hit/miss statistics in the same form as
+        functools.lru_cache, invalidate() drops entries.
+    """
+
+    __slots__ = ('coe_func', 'quantum', 'maxsize', 'args', 'hits', 'misses', '_entries')
+
+    def __init__(self, coe_func, quantum=1.0/86400, maxsize=4096, args=()):
+        if maxsize < 1:
+            raise ValueError("maxsize must be at least 1")
+
+        self.coe_func = coe_func
+        self.quantum = quantum
+        self.maxsize = maxsize
+        self.args = tuple(args)
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+
+    def _key(self, JD, flag, args):
+        if self.quantum is None:
+            return (float(JD), flag) + args
+        else:
+            return (int(round(JD/self.quantum)), flag) + args
+
+    def __call__(self, JD_curr, flag, *args):
+        args = args or self.args
+        key = self._key(JD_curr, flag, args)
+
+        try:
+            coe = self._entries[key]
+        except KeyError:
+            self.misses += 1
+            JD = key[0] if self.quantum is None else key[0]*self.quantum
+            coe = self.coe_func(JD, flag, *args)
+            self._entries[key] = coe
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+        else:
+            self.hits += 1
+            self._entries.move_to_end(key)
+
+        return coe
+
+    def __len__(self):
+        return len(self._entries)
+
+    def cache_info(self):
+        """Hits, misses, maxsize and current size of the cache"""
+        return CacheInfo(self.hits, self.misses, self.maxsize, len(self._entries))
+
+    def invalidate(self, flag=None, JD_start=None, JD_end=None):
+        """
+            Drop cached entries and return how many were removed
+
+            With no arguments the whole cache is cleared (the statistics
+            are kept). flag restricts the removal to one body and
+            JD_start/JD_end to the epochs inside [JD_start, JD_end].
+        """
+        removed = 0
+        for key in list(self._entries):
+            JD = key[0] if self.quantum is None else key[0]*self.quantum
+            if flag is not None and key[1] != flag:
+                continue
+            if JD_start is not None and JD < JD_start:
+                continue
+            if JD_end is not None and JD > JD_end:
+                continue
+            del self._entries[key]
+            removed += 1
+
+        return removed
+
+    def cache_clear(self):
+        """Clear the cache and reset the statistics"""
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+def cached_planet_coe(quantum=1.0/86400, maxsize=4096):
+    """ElementCache around planet_coe, called as cache(JD_curr, planet_flag)"""
+    return ElementCache(planet_coe, quantum, maxsize)
+
+def cached_asteroid_coe(quantum=1.0/86400, maxsize=4096, catalog=builtin_catalog):
+    """
+        ElementCache around asteroid_coe, called as cache(JD_curr, ast_flag)
+        for the rows of catalog or cache(JD_curr, ast_flag, other_catalog)
+    """
+    return ElementCache(asteroid_coe, quantum, maxsize, (catalog,))
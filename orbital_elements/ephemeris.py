@@ -0,0 +1,149 @@
+"""Piecewise Chebyshev ephemerides compiled from the element models"""
+import numpy as np
+from keplerian_orbit.coe import coe2rv
+
+mu_sun = 1/149597870700**3 * 1.32712440018e20 # au^3 / sec^2
+
+class ChebyshevEphemeris(object):
+    """
+        Piecewise Chebyshev position ephemeris (in the style of SPK type 2)
+
+        Each segment of seg_days days stores Chebyshev coefficients for the
+        x, y and z position. Velocity is the derivative of the same series,
+        so only position is fit. Use compile_ephemeris to build one.
+
+        Attributes:
+           - JD_start - start of the first segment
+           - seg_days - length of each segment (days)
+           - coeffs - (n_seg, 3, degree+1) position coefficients (au)
+           - dcoeffs - (n_seg, 3, degree) coefficients of d/dtau
+           - max_error - largest position error (au) seen against the direct
+           element path while compiling
+    """
+
+    __slots__ = ('JD_start', 'seg_days', 'coeffs', 'dcoeffs', 'max_error')
+
+    def __init__(self, JD_start, seg_days, coeffs):
+        self.JD_start = JD_start
+        self.seg_days = seg_days
+        self.coeffs = coeffs
+        self.dcoeffs = _chebyshev_derivative(coeffs)
+        self.max_error = np.nan
+
+    @property
+    def JD_end(self):
+        return self.JD_start + self.seg_days*self.coeffs.shape[0]
+
+    def _segment(self, JD):
+        JD = np.asarray(JD, dtype=float)
+        if np.any(JD < self.JD_start) or np.any(JD > self.JD_end):
+            raise ValueError("JD outside of the compiled span %f - %f" % (self.JD_start, self.JD_end))
+
+        idx = np.floor((JD - self.JD_start)/self.seg_days).astype(int)
+        idx = np.minimum(idx, self.coeffs.shape[0] - 1)
+        tau = 2.0*(JD - self.JD_start - idx*self.seg_days)/self.seg_days - 1.0
+
+        return (idx, tau)
+
+    def position(self, JD):
+        """
+            r = ephem.position(JD)
+
+            Position (3,) or (T,3) in au at a JD or an array of JD
+        """
+        idx, tau = self._segment(JD)
+        return clenshaw(self.coeffs[idx], tau)
+
+    def state(self, JD):
+        """
+            (r,v) = ephem.state(JD)
+
+            Position (au) and velocity (au/sec) at a JD or an array of JD
+        """
+        idx, tau = self._segment(JD)
+        r = clenshaw(self.coeffs[idx], tau)
+        v = clenshaw(self.dcoeffs[idx], tau) * 2.0/(self.seg_days*86400)
+
+        return (r, v)
+
+def clenshaw(coeffs, tau):
+    """
+        Evaluate Chebyshev series by Clenshaw summation
+
+        Inputs:
+           - coeffs - (..., 3, degree+1) coefficients, leading dimensions
+           matching tau
+           - tau - normalized time -1 <= tau <= 1
+
+        Outputs:
+           - (..., 3) value of the series
+    """
+    x = np.asarray(tau)[..., np.newaxis]
+    b_1 = np.zeros(coeffs.shape[:-1])
+    b_2 = np.zeros(coeffs.shape[:-1])
+    for k in range(coeffs.shape[-1] - 1, 0, -1):
+        b_1, b_2 = 2.0*x*b_1 - b_2 + coeffs[..., k], b_1
+
+    return x*b_1 - b_2 + coeffs[..., 0]
+
+def _chebyshev_derivative(coeffs):
+    """Coefficients of the derivative of a Chebyshev series w.r.t. tau"""
+    n = coeffs.shape[-1] - 1
+    dcoeffs = np.zeros(coeffs.shape[:-1] + (max(n, 1),))
+    for k in range(n, 0, -1):
+        dcoeffs[..., k-1] = 2.0*k*coeffs[..., k]
+        if k + 1 < n:
+            dcoeffs[..., k-1] += dcoeffs[..., k+1]
+    dcoeffs[..., 0] *= 0.5
+
+    return dcoeffs
+
+def compile_ephemeris(coe_func, JD_start, JD_end, seg_days=16.0, degree=12, mu=mu_sun, n_check=8):
+    """
+        Compile a body into a piecewise Chebyshev ephemeris
+
+        ephem = compile_ephemeris(coe_func, JD_start, JD_end)
+
+        Inputs:
+           - coe_func - function of JD returning the (p,ecc,inc,raan,argp,nu)
+           tuple, e.g. lambda JD: planet_coe(JD, 2) or
+           lambda JD: asteroid_coe(JD, 1)
+           - JD_start, JD_end - span to cover (JD_end is rounded up to a
+           whole segment)
+           - seg_days - segment length in days
+           - degree - degree of the Chebyshev fit in each segment
+           - mu - gravitational parameter consistent with p (au^3/sec^2)
+           - n_check - number of points per segment (between the fit nodes)
+           used to measure the interpolation error
+
+        Outputs:
+           - ephem - ChebyshevEphemeris, ephem.max_error holds the maximum
+           position error (au) against coe_func + coe2rv
+    """
+    def position(JD):
+        p, ecc, inc, raan, argp, nu = coe_func(JD)
+        return coe2rv(p,ecc,inc,raan,argp,nu,mu)[0]
+
+    n_seg = int(np.ceil((JD_end - JD_start)/seg_days))
+    n_node = degree + 1
+
+    # Chebyshev nodes and the matrix projecting samples onto T_k
+    nodes = np.cos(np.pi*(np.arange(n_node) + 0.5)/n_node)
+    T = np.cos(np.outer(np.arange(n_node), np.arccos(nodes))) * 2.0/n_node
+    T[0] *= 0.5
+
+    coeffs = np.empty((n_seg, 3, n_node))
+    for seg in range(n_seg):
+        JD_0 = JD_start + seg*seg_days
+        samples = np.array([position(JD_0 + 0.5*(x + 1.0)*seg_days) for x in nodes])
+        coeffs[seg] = T.dot(samples).T
+
+    ephem = ChebyshevEphemeris(JD_start, seg_days, coeffs)
+
+    # check the fit between the nodes against the direct path
+    JD_check = JD_start + seg_days*(np.arange(n_seg*n_check) + 0.5)/n_check
+    r_direct = np.array([position(JD) for JD in JD_check])
+    r_cheb = ephem.position(JD_check)
+    ephem.max_error = np.max(np.sqrt(np.sum((r_cheb - r_direct)**2, axis=1)))
+
+    return ephem
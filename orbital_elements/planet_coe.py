@@ -1,7 +1,7 @@
 """Module to output the orbital elements of the planets"""
 import numpy as np
 from utilities.attitude import normalize
-from keplerian_orbit.keplerian_orbit import kepler_eq_E
+from keplerian_orbit.keplerian_orbit import kepler_eq_E, kepler_eq_E_vec
 
 def planet_coe(JD_curr, planet_flag):
     """
@@ -26,7 +26,7 @@ def planet_coe(JD_curr, planet_flag):
 
     # compute argp and M/v to complete the element set
     argp = lonperi - raan
-    M = L - lonperi + b*T**2 + c*np.cos(f*T) + s*np.sin(f*T)
+    M = L - lonperi + b*T**2 + c*np.cos(np.deg2rad(f*T)) + s*np.sin(np.deg2rad(f*T))
 
     M = normalize(np.deg2rad(M),-np.pi,np.pi)
     # solve kepler's equation to compute E and v
@@ -39,193 +39,195 @@ def planet_coe(JD_curr, planet_flag):
 
     return coe
 
-def planet_approx(JD,planet_flag):
+def planets_coe(JD_curr, planet_flags=None, dtype=float):
     """
-    This outputs the orbital element information data for the selected planet. 
-    Also does some logic checking based on the desired time period
+    Given current JD this function will output the current orbital elements
+    for all of the planets at once
+
+    The element rates for every body are evaluated together from
+    planet_table and Kepler's equation is solved for all of them with a
+    single kepler_eq_E_vec call. Returns an (N_bodies, 6) array with the
+    columns (p,ecc,inc,raan,argp,nu), one row per planet flag. planet_flags
+    may select a subset of the bodies (default is all nine).
+
+    JD_curr may also be an array of T epochs, in which case the output is
+    (T, N_bodies, 6), or (T, 6) for a single integer planet flag. The
+    elements are always computed in double precision, dtype=np.float32 only
+    casts the output to halve the memory of long histories. Each epoch uses
+    the fine or the coarse element table (see planet_approx_table), so a
+    series may span both models.
     """
 
-    JD_1800AD = 2378497.000000 
-    JD_2050AD = 2469808.000000
-
-    JD_3000BC = 625674.000000
-    JD_3000AD = 2816788.000000
-
-    if JD < JD_1800AD or JD > JD_2050AD: # have to use the coarse model
-
-        
-        print("Date is outside 1800-2050. Need to implement the coarse model.")
-    else: # date is between 1800-2050AD and use the fine model
-        b = 0.0
-        c = 0.0
-        f = 0.0
-        s = 0.0
-
-        if planet_flag == 0: # mercury
-            a0 = 0.38709927
-            adot = 0.00000037
-
-            e0 = 0.20563593
-            edot = 0.00001906
-
-            inc0 = 7.00497902
-            incdot = -0.00594749
-
-            meanL0 = 252.25032350
-            meanLdot = 149472.67411175
-
-            lonperi0 = 77.45779628
-            lonperidot = 0.16047689
-
-            raan0 = 48.33076593
-            raandot = -0.12534081
-
-        elif planet_flag == 1: # venus
-            a0 = 0.72333566
-            adot = 0.00000390
-
-            e0 = 0.00677672 
-            edot = -0.00004107
-
-            inc0 = 3.39467605
-            incdot = -0.00078890
-
-            meanL0 = 181.97909950
-            meanLdot = 58517.81538729
-
-            lonperi0 = 131.60246718
-            lonperidot = 0.00268329
-
-            raan0 = 76.67984255
-            raandot = -0.27769418
-        elif planet_flag == 2: # earth moon barycenter
-            a0 = 1.00000261
-            adot = 0.00000562
-
-            e0 = 0.01671123 
-            edot = -0.00004392
-
-            inc0 = -0.00001531
-            incdot = -0.01294668
-
-            meanL0 = 100.46457166
-            meanLdot = 35999.37244981
-
-            lonperi0 = 102.93768193
-            lonperidot = 0.32327364
-
-            raan0 = 0.0
-            raandot = 0.0
-        elif planet_flag == 3: # mars
-            a0 = 1.52371034
-            adot = 0.00001847
-
-            e0 = 0.09339410 
-            edot = 0.00007882
-
-            inc0 = 1.84969142
-            incdot = -0.00813131
-
-            meanL0 = -4.55343205
-            meanLdot = 19140.30268499
-
-            lonperi0 = -23.94362959
-            lonperidot = 0.44441088
+    table = planet_approx_table(JD_curr)
+    if planet_flags is not None:
+        table = table[..., planet_flags]
 
-            raan0 = 49.55953891
-            raandot = -0.29257343
-        elif planet_flag == 4: # jupiter
-            a0 = 5.20288700
-            adot = -0.00011607
-
-            e0 = 0.04838624 
-            edot = -0.00013253
-
-            inc0 = 1.30439695 
-            incdot = -0.00183714
-
-            meanL0 = 34.39644051
-            meanLdot = 3034.74612775
-
-            lonperi0 = 14.72847983
-            lonperidot = 0.21252668
-
-            raan0 = 100.47390909
-            raandot = 0.20469106
-        elif planet_flag == 5: # saturn
-            a0 = 9.53667594
-            adot = -0.00125060
-
-            e0 = 0.05386179 
-            edot = -0.00050991
-
-            inc0 = 2.48599187 
-            incdot = 0.00193609
-
-            meanL0 = 49.95424423
-            meanLdot = 1222.49362201
-
-            lonperi0 = 92.59887831
-            lonperidot = -0.41897216
+    # Find the JD centuries past J2000 epoch
+    JD_J2000 = 2451545.0
+    T = (np.asarray(JD_curr, dtype=float) - JD_J2000)/36525
+    # epochs along the rows, bodies along the columns
+    T = T.reshape(T.shape + (1,)*(table.ndim - T.ndim))
 
-            raan0 = 113.66242448
-            raandot = -0.28867794
-        elif planet_flag == 6: # uranus
-            a0 = 19.18916464
-            adot = -0.00196176
+    # compute the current elements at this JD
+    a = table['a0'] + table['adot']*T
+    ecc = table['e0'] + table['edot']*T
+    inc = table['inc0'] + table['incdot']*T
+    L = table['meanL0'] + table['meanLdot']*T
+    lonperi = table['lonperi0'] + table['lonperidot']*T
+    raan = table['raan0'] + table['raandot']*T
 
-            e0 = 0.04725744 
-            edot = -0.00004397
+    # compute argp and M/v to complete the element set
+    argp = lonperi - raan
+    f = table['f']
+    M = (L - lonperi + table['b']*T**2 + table['c']*np.cos(np.deg2rad(f*T))
+         + table['s']*np.sin(np.deg2rad(f*T)))
 
-            inc0 = 0.77263783 
-            incdot = -0.00242939
+    M = normalize(np.deg2rad(M),-np.pi,np.pi)
+    # solve kepler's equation to compute E and v
+    E, nu, count = kepler_eq_E_vec(M,ecc)
 
-            meanL0 = 313.23810451
-            meanLdot = 428.48202785
+    # package into an array and output
+    p = a * (1-ecc**2)
 
-            lonperi0 = 170.95427630
-            lonperidot = 0.40805281
+    coe = np.stack((p,ecc,np.deg2rad(inc),np.deg2rad(raan),np.deg2rad(argp),normalize(nu,0,2*np.pi)), axis=-1)
 
-            raan0 = 74.01692503
-            raandot = 0.04240589
-        elif planet_flag == 7: # neptune
-            a0 = 30.06992276
-            adot = 0.00026291
+    return coe.astype(dtype, copy=False)
 
-            e0 = 0.00859048
-            edot = 0.00005105
+def planets_coe_series(JD, chunk_size=8760, planet_flags=None, dtype=float):
+    """
+    Generator over a long series of JD for ephemeris sweeps
 
-            inc0 = 1.77004347  
-            incdot = 0.00035372
+    for JD_chunk, coe in planets_coe_series(JD):
+        ...
 
-            meanL0 = -55.12002969
-            meanLdot = 218.45945325
+    Evaluates planets_coe over consecutive slices of at most chunk_size
+    epochs of the JD array (default is one year at hourly steps), so only
+    one chunk of elements, (chunk_size, N_bodies, 6), is held in memory at a
+    time. planet_flags and dtype are passed on to planets_coe.
+    """
+    JD = np.atleast_1d(np.asarray(JD, dtype=float))
+    for start in range(0, JD.shape[0], chunk_size):
+        JD_chunk = JD[start:start+chunk_size]
+        yield (JD_chunk, planets_coe(JD_chunk, planet_flags, dtype))
 
-            lonperi0 = 44.96476227 
-            lonperidot = -0.32241464
+def planet_approx_table(JD):
+    """
+    Select the table of element data valid at JD. Does the logic checking
+    based on the desired time period
 
-            raan0 = 131.78422574
-            raandot = -0.00508664
-        elif planet_flag == 8: # pluto
-            a0 = 39.48211675
-            adot = -0.00031596
+    Dates between 1800-2050AD use the fine model (planet_table) and all
+    other dates the coarse 3000BC-3000AD model (planet_table_coarse). For
+    an array of JD the model is picked per epoch by mask and the output is
+    a (..., 9) structured array with one table row per epoch and planet.
+    """
 
-            e0 = 0.24882730 
-            edot = 0.00005170
+    JD_1800AD = 2378497.000000 
+    JD_2050AD = 2469808.000000
 
-            inc0 = 17.14001206  
-            incdot = 0.00004818
+    JD_3000BC = 625674.000000
+    JD_3000AD = 2816788.000000
 
-            meanL0 = 238.92903833
-            meanLdot = 145.20780515
+    JD = np.asarray(JD, dtype=float)
+    if np.any(JD < JD_3000BC) or np.any(JD > JD_3000AD):
+        print("Date is outside 3000BC-3000AD. The coarse model is being extrapolated.")
 
-            lonperi0 = 224.06891629 
-            lonperidot = -0.04062942
+    fine = (JD >= JD_1800AD) & (JD <= JD_2050AD)
+    if np.ndim(fine) == 0:
+        return planet_table if fine else planet_table_coarse
+    else: # pick the model for each epoch
+        return planet_tables[np.where(fine, 0, 1)]
 
-            raan0 = 110.30393684
-            raandot = -0.01183482
-        else:
-            print("Incorrect planet flag should be between 1 and 9")
+def planet_approx(JD,planet_flag):
+    """
+    This outputs the orbital element information data for the selected planet. 
+    Also does some logic checking based on the desired time period
+    """
 
-        
-        return (a0,adot,e0,edot,inc0,incdot,meanL0,meanLdot,lonperi0,lonperidot,raan0,raandot,b,c,f,s)
\ No newline at end of file
+    table = planet_approx_table(JD)
+
+    if planet_flag < 0 or planet_flag >= table.shape[0]:
+        raise ValueError("Incorrect planet flag should be between 0 and 8")
+
+    return tuple(table[planet_flag].tolist())
+
+# element data for each planet, one row per planet flag
+planet_dtype = np.dtype([('a0', float), ('adot', float),
+                         ('e0', float), ('edot', float),
+                         ('inc0', float), ('incdot', float),
+                         ('meanL0', float), ('meanLdot', float),
+                         ('lonperi0', float), ('lonperidot', float),
+                         ('raan0', float), ('raandot', float),
+                         ('b', float), ('c', float), ('f', float), ('s', float)])
+
+# Table 1. Keplerian elements and their rates, with respect to the mean
+# ecliptic and equinox of J2000, valid for the time-interval 1800 AD - 2050 AD.
+#   a0, adot (au, au/Cy)    e0, edot    inc0, incdot (deg, deg/Cy)
+#   meanL0, meanLdot    lonperi0, lonperidot    raan0, raandot (deg, deg/Cy)
+#   b, c, f, s are zero for this model
+planet_table = np.array([
+    (0.38709927, 0.00000037, 0.20563593, 0.00001906, 7.00497902, -0.00594749,
+     252.25032350, 149472.67411175, 77.45779628, 0.16047689, 48.33076593, -0.12534081,
+     0.0, 0.0, 0.0, 0.0), # mercury
+    (0.72333566, 0.00000390, 0.00677672, -0.00004107, 3.39467605, -0.00078890,
+     181.97909950, 58517.81538729, 131.60246718, 0.00268329, 76.67984255, -0.27769418,
+     0.0, 0.0, 0.0, 0.0), # venus
+    (1.00000261, 0.00000562, 0.01671123, -0.00004392, -0.00001531, -0.01294668,
+     100.46457166, 35999.37244981, 102.93768193, 0.32327364, 0.0, 0.0,
+     0.0, 0.0, 0.0, 0.0), # earth moon barycenter
+    (1.52371034, 0.00001847, 0.09339410, 0.00007882, 1.84969142, -0.00813131,
+     -4.55343205, 19140.30268499, -23.94362959, 0.44441088, 49.55953891, -0.29257343,
+     0.0, 0.0, 0.0, 0.0), # mars
+    (5.20288700, -0.00011607, 0.04838624, -0.00013253, 1.30439695, -0.00183714,
+     34.39644051, 3034.74612775, 14.72847983, 0.21252668, 100.47390909, 0.20469106,
+     0.0, 0.0, 0.0, 0.0), # jupiter
+    (9.53667594, -0.00125060, 0.05386179, -0.00050991, 2.48599187, 0.00193609,
+     49.95424423, 1222.49362201, 92.59887831, -0.41897216, 113.66242448, -0.28867794,
+     0.0, 0.0, 0.0, 0.0), # saturn
+    (19.18916464, -0.00196176, 0.04725744, -0.00004397, 0.77263783, -0.00242939,
+     313.23810451, 428.48202785, 170.95427630, 0.40805281, 74.01692503, 0.04240589,
+     0.0, 0.0, 0.0, 0.0), # uranus
+    (30.06992276, 0.00026291, 0.00859048, 0.00005105, 1.77004347, 0.00035372,
+     -55.12002969, 218.45945325, 44.96476227, -0.32241464, 131.78422574, -0.00508664,
+     0.0, 0.0, 0.0, 0.0), # neptune
+    (39.48211675, -0.00031596, 0.24882730, 0.00005170, 17.14001206, 0.00004818,
+     238.92903833, 145.20780515, 224.06891629, -0.04062942, 110.30393684, -0.01183482,
+     0.0, 0.0, 0.0, 0.0), # pluto
+], dtype=planet_dtype)
+
+# Table 2a. Keplerian elements and their rates, with respect to the mean
+# ecliptic and equinox of J2000, valid for the time-interval 3000 BC -- 3000 AD.
+# Table 2b. Additional terms b, c, s, f which must be added to the computation
+# of M for Jupiter through Pluto (f in deg/Cy)
+#   M = L - lonperi + b*T**2 + c*cos(f*T) + s*sin(f*T)
+planet_table_coarse = np.array([
+    (0.38709843, 0.00000000, 0.20563661, 0.00002123, 7.00559432, -0.00590158,
+     252.25166724, 149472.67486623, 77.45771895, 0.15940013, 48.33961819, -0.12214182,
+     0.0, 0.0, 0.0, 0.0), # mercury
+    (0.72332102, -0.00000026, 0.00676399, -0.00005107, 3.39777545, 0.00043494,
+     181.97970850, 58517.81560260, 131.76755713, 0.05679648, 76.67261496, -0.27274174,
+     0.0, 0.0, 0.0, 0.0), # venus
+    (1.00000018, -0.00000003, 0.01673163, -0.00003661, -0.00054346, -0.01337178,
+     100.46691572, 35999.37306329, 102.93005885, 0.31795260, -5.11260389, -0.24123856,
+     0.0, 0.0, 0.0, 0.0), # earth moon barycenter
+    (1.52371243, 0.00000097, 0.09336511, 0.00009149, 1.85181869, -0.00724757,
+     -4.56813164, 19140.29934243, -23.91744784, 0.45223625, 49.71320984, -0.26852431,
+     0.0, 0.0, 0.0, 0.0), # mars
+    (5.20248019, -0.00002864, 0.04853590, 0.00018026, 1.29861416, -0.00322699,
+     34.33479152, 3034.90371757, 14.27495244, 0.18199196, 100.29282654, 0.13024619,
+     -0.00012452, 0.06064060, 38.35125000, -0.35635438), # jupiter
+    (9.54149883, -0.00003065, 0.05550825, -0.00032044, 2.49424102, 0.00451969,
+     50.07571329, 1222.11494724, 92.86136063, 0.54179478, 113.63998702, -0.25015002,
+     0.00025899, -0.13434469, 38.35125000, 0.87320147), # saturn
+    (19.18797948, -0.00020455, 0.04685740, -0.00001550, 0.77298127, -0.00180155,
+     314.20276625, 428.49512595, 172.43404441, 0.09266985, 73.96250215, 0.05739699,
+     0.00058331, -0.97731848, 7.67025000, 0.17689245), # uranus
+    (30.06952752, 0.00006447, 0.00895439, 0.00000818, 1.77005520, 0.00022400,
+     304.22289287, 218.46515314, 46.68158724, 0.01009938, 131.78635853, -0.00606302,
+     -0.00041348, 0.68346318, 7.67025000, -0.10162547), # neptune
+    (39.48686035, 0.00449751, 0.24885238, 0.00006016, 17.14104260, 0.00000501,
+     238.96535011, 145.18042903, 224.09702598, -0.00968827, 110.30167986, -0.00809981,
+     -0.01262724, 0.0, 0.0, 0.0), # pluto
+], dtype=planet_dtype)
+
+# both models stacked so a model index per epoch selects the rows
+planet_tables = np.stack((planet_table, planet_table_coarse))
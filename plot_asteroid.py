@@ -3,15 +3,14 @@
 import numpy as np 
 from datetime import datetime
 from utilities.time import date2jd
-from utilities.attitude import normalize
 import matplotlib.pyplot as plt 
-from mpl_toolkits.mplot3d import Axes3D
-from keplerian_orbit.keplerian_orbit import conic_orbit, kepler_eq_E, tof_delta_t
-from orbital_elements.planet_coe import planet_coe
+from mpl_toolkits.mplot3d import Axes3D # noqa: F401 registers the 3d projection
+from keplerian_orbit.keplerian_orbit import conic_orbit, conic_orbit_vec, tof_sequence
+from orbital_elements.planet_coe import planets_coe
 
 from orbital_elements.asteroid_coe import asteroid_coe
 
-from keplerian_orbit.coe import coe2rv
+from keplerian_orbit.coe import coe2rv, coe2rv_vec
 
 
 km2au = 1/149597870.700
@@ -32,19 +31,15 @@ def write_to_file():
         # compute period of orbit
         period = 500*2*np.pi*np.sqrt((p/(1-ecc**2))**3/mu) # period in seconds
 
-        with open(asteroid_names[ast_flag] + ".txt", "w") as text_file:
+        time_span = np.arange(0,period,86400)
+        # propogate epoch to each t warm starting from the previous step
+        nu_span = np.array([nu_curr for t_curr, E_curr, M_curr, nu_curr in tof_sequence(p,ecc,mu,nu,time_span)])
+        # convert all the COE to RV at once
+        r_ijk, v_ijk, r_pqw, v_pqw = coe2rv_vec(p,ecc,inc,raan,argp,nu_span,mu)
 
-            print("Asteroid: {} state wrt Sol barycenter ( t(sec) x(km) y(km) z(km) vx(km/sec) vy(km/sec) vz(km/sec)".format(asteroid_names[ast_flag]), file=text_file)
-            # loop over nu and compute COE2RV and print to text file
-            time_span = np.arange(0,period,86400)
-            for idx,t_curr in enumerate(time_span):
-
-                # propogate epoch to current t
-                nu_curr = tof_delta_t(p,ecc,mu,nu,t_curr)[2]
-                # convert COE to RV
-                r_ijk, v_ijk, r_pqw, v_pqw = coe2rv(p,ecc,inc,raan,argp,nu_curr,mu)
-                # print to text file
-                print("%16.16f %16.16f %16.16f %16.16f %16.16f %16.16f %16.16f" % (t_curr, r_ijk[0], r_ijk[1], r_ijk[2], v_ijk[0], v_ijk[1], v_ijk[2]), file=text_file)
+        header = "Asteroid: {} state wrt Sol barycenter ( t(sec) x(km) y(km) z(km) vx(km/sec) vy(km/sec) vz(km/sec)".format(asteroid_names[ast_flag])
+        np.savetxt(asteroid_names[ast_flag] + ".txt", np.column_stack((time_span, r_ijk, v_ijk)),
+                   fmt='%16.16f', header=header, comments='')
 
     return 0
 
@@ -63,12 +58,12 @@ ax = fig.add_subplot(111, projection='3d')
 
 # plot the planets
 planet_names = ('Mercury', 'Venus', 'Earth', 'Mars', 'Jupiter', 'Saturn', 'Uranus', 'Neptune', 'Pluto')
-# loop over all the planets and compute the COE
+# compute the COE of all the planets and their conic orbits in one pass
+planet_elements = planets_coe(JD_curr)
+orbits, positions = conic_orbit_vec(*planet_elements.T)
 for planet_flag in range(9):
-    # calculate the conic orbit for each planet 
-    p,ecc,inc,raan,argp,nu = planet_coe(JD_curr,planet_flag)
-
-    (x,y,z,xs,ys,zs) = conic_orbit(p,ecc, inc, raan, argp, nu, nu)
+    (x,y,z) = orbits[planet_flag].T
+    (xs,ys,zs) = positions[planet_flag]
     # plot the planet to figure
     ax.plot(x,y,z,'b')
     ax.plot([xs],[ys],[zs],'ro')
@@ -0,0 +1,175 @@
+"""Pytest for catalog.py"""
+import os
+import numpy as np
+import pytest
+from orbital_elements.catalog import (AsteroidCatalog, builtin_catalog, load_mpcorb, load_sbdb_csv,
+                                      unpack_epoch, save_catalog, open_catalog, load_catalog)
+from orbital_elements.asteroid_coe import (asteroid_epoch, asteroid_coe, asteroids_coe, asteroids_rv,
+                                           propagate_catalog)
+from orbital_elements.ephemeris import mu_sun
+from keplerian_orbit.coe import coe2rv
+from utilities.attitude import pqw_to_inertial
+
+# (packed epoch, M, argp, raan, inc, ecc, a, readable designation)
+mpc_rows = [('K172G', 3.40919, 234.82459, 93.39123, 7.43679, 0.0834860, 0.9582899, '(341843) 2008 EV5'),
+            ('K172G', 131.43403, 162.80348, 69.07993, 1.62146, 0.2801177, 1.3241636, '(25143) Itokawa'),
+            ('K1111', 101.70395, 66.22307, 2.06087, 6.03494, 0.2037451, 1.1263910, '(101955) Bennu'),
+            ('K2555', 188.70269, 73.27343, 80.25221, 10.58780, 0.0789175, 2.7660512, '2019 AB')]
+
+def mpc_line(epoch, M, argp, raan, inc, ecc, a, designation):
+    """One fixed width MPCORB.DAT record"""
+    line = ('%-7s %5.2f %5.2f %5s %9.5f  %9.5f  %9.5f  %9.5f  %9.7f %11.8f %11.7f'
+            % ('00000', 15.0, 0.15, epoch, M, argp, raan, inc, ecc, 0.2, a))
+    return line.ljust(166) + designation.ljust(28) + '20241101'
+
+def test_unpack_epoch():
+    """Packed epochs match date2jd"""
+    np.testing.assert_allclose(unpack_epoch(['K172G', 'K1111', 'J9611']),
+                               [2457800.5, 2455562.5, 2450083.5])
+
+def test_load_mpcorb(tmp_path):
+    """Fixed width columns and readable designations are parsed"""
+    filename = tmp_path / 'MPCORB.DAT'
+    header = 'MINOR PLANET CENTER ORBIT DATABASE (MPCORB)\n\nDes\'n     H     G   Epoch\n' + '-'*160 + '\n'
+    filename.write_text(header + '\n'.join(mpc_line(*row) for row in mpc_rows) + '\n\n')
+
+    catalog = load_mpcorb(str(filename))
+
+    assert len(catalog) == 4
+    np.testing.assert_array_equal(catalog.number, [341843, 25143, 101955, -1])
+    np.testing.assert_array_equal(catalog.name, ['2008 EV5', 'Itokawa', 'Bennu', '2019 AB'])
+    np.testing.assert_allclose(catalog.a[:3], builtin_catalog.a, rtol=1e-7)
+    np.testing.assert_allclose(catalog.M[:3], builtin_catalog.M, atol=1e-7)
+    np.testing.assert_allclose(catalog.inc[:3], builtin_catalog.inc, atol=1e-7)
+    np.testing.assert_allclose(catalog.JD_epoch[:3], builtin_catalog.JD_epoch)
+
+def test_load_sbdb_csv(tmp_path):
+    """SBDB exports are parsed with either full_name or pdes"""
+    filename = tmp_path / 'sbdb.csv'
+    filename.write_text('full_name,epoch,e,a,i,om,w,ma\n'
+                        '"101955 Bennu (1999 RQ36)",2455562.5,0.2037451112033579,1.126391026007489,'
+                        '6.034939195483961,2.060867837066797,66.22306857848962,101.7039476994243\n'
+                        '"341843 (2008 EV5)",2457800.5,0.08348599378460778,0.9582899238313918,'
+                        '7.436787362690259,93.39122898787916,234.8245876826614,3.409187469072454\n'
+                        '"(2019 AB)",2460800.5,0.5,2.0,10.0,20.0,30.0,\n')
+
+    catalog = load_sbdb_csv(str(filename))
+
+    np.testing.assert_array_equal(catalog.number, [101955, 341843, -1])
+    np.testing.assert_array_equal(catalog.name, ['Bennu', '2008 EV5', '2019 AB'])
+    np.testing.assert_allclose(catalog.raan[:2], builtin_catalog.raan[[2, 0]])
+    assert np.isnan(catalog.M[2])
+
+    filename.write_text('pdes,name,epoch,e,a,i,om,w,ma\n'
+                        '25143,Itokawa,2457800.5,0.28011765678781,1.324163617639197,'
+                        '1.62145641293925,69.07992986350325,162.8034822691509,131.4340297670125\n')
+    catalog = load_sbdb_csv(str(filename))
+
+    assert catalog.index('Itokawa') == 0
+    np.testing.assert_allclose(catalog.epoch(0), asteroid_epoch(1))
+
+def test_index_lookup():
+    """Rows are found by number or name"""
+    assert builtin_catalog.index(101955) == 2
+    assert builtin_catalog.index('Itokawa') == 1
+    assert builtin_catalog.index('2008 EV5') == 0
+    with pytest.raises(KeyError):
+        builtin_catalog.index(1)
+
+    subset = builtin_catalog.subset([2, 0])
+    assert isinstance(subset, AsteroidCatalog)
+    assert subset.index('Bennu') == 0
+
+def test_asteroid_epoch_flags():
+    """Flags and names select the built-in rows and bad flags raise"""
+    np.testing.assert_allclose(asteroid_epoch('Bennu'), asteroid_epoch(2))
+    np.testing.assert_allclose(asteroid_coe(2458000.5, 'Itokawa'), asteroid_coe(2458000.5, 1))
+    with pytest.raises(ValueError):
+        asteroid_epoch(3)
+
+def test_memmap_store(tmp_path):
+    """A saved catalog opens as memory mapped columns with the same data"""
+    path = str(tmp_path / 'catalog')
+    save_catalog(builtin_catalog, path)
+
+    catalog = open_catalog(path)
+
+    assert len(catalog) == 3
+    assert isinstance(catalog.a, np.memmap)
+    for column in AsteroidCatalog.columns[2:]:
+        np.testing.assert_array_equal(getattr(catalog, column), getattr(builtin_catalog, column))
+    np.testing.assert_array_equal(catalog.number, builtin_catalog.number)
+    assert catalog.index('Bennu') == 2
+    assert catalog.index(25143) == 1
+
+    JD = 2458000.5
+    coe = asteroids_coe(JD, catalog)
+    assert coe.shape == (3, 6)
+    for ast_flag in range(3):
+        np.testing.assert_allclose(coe[ast_flag], asteroid_coe(JD, ast_flag, catalog), rtol=1e-9)
+    np.testing.assert_allclose(asteroids_coe(JD, catalog, rows=[2]), coe[[2]])
+
+def test_propagate_catalog():
+    """Chunked and multi-process propagation fill the preallocated output"""
+    catalog = builtin_catalog.subset([0, 1, 2, 0, 1, 2, 0])
+    JD = [2458000.5, 2458100.5]
+
+    coe = propagate_catalog(JD[0], catalog, chunk_size=2)
+    np.testing.assert_allclose(coe, asteroids_coe(JD[0], catalog))
+
+    out = np.zeros((2, 7, 6), dtype=np.float32)
+    coe_series = propagate_catalog(JD, catalog, chunk_size=3, workers=2, out=out)
+    assert coe_series is out
+    for k in range(2):
+        np.testing.assert_allclose(out[k], asteroids_coe(JD[k], catalog), rtol=1e-6)
+
+    with pytest.raises(ValueError):
+        propagate_catalog(JD, catalog, out=np.zeros((7, 6)))
+
+def test_persisted_invariants(tmp_path):
+    """load_catalog caches the invariants and rebuilds when the source changes"""
+    source = tmp_path / 'MPCORB.DAT'
+    source.write_text('\n'.join(mpc_line(*row) for row in mpc_rows[:3]) + '\n')
+
+    catalog = load_catalog(str(source))
+
+    assert os.path.isfile(str(source) + '.cache/header.json')
+    assert isinstance(catalog.n, np.memmap)
+    assert catalog.dcm_pqw2eci.shape == (3, 3, 3)
+    np.testing.assert_allclose(catalog.dcm_pqw2eci[1],
+                               pqw_to_inertial(catalog.raan[1], catalog.inc[1], catalog.argp[1]))
+    np.testing.assert_allclose(catalog.n, builtin_catalog.n, rtol=1e-6)
+
+    # cached catalog is reused, then rebuilt after the file changes
+    assert load_catalog(str(source)).index('Bennu') == 2
+    source.write_text('\n'.join(mpc_line(*row) for row in mpc_rows) + '\n')
+    os.utime(str(source), ns=(0, 0))
+    catalog = load_catalog(str(source))
+    assert len(catalog) == 4
+    assert catalog.n.shape == (4,)
+
+def test_asteroids_rv():
+    """Batched states match coe2rv of the propagated elements"""
+    JD = 2458000.5
+    r, v = asteroids_rv(JD, builtin_catalog)
+    coe = asteroids_coe(JD, builtin_catalog)
+
+    for ast_flag in range(3):
+        r_true, v_true = coe2rv(*coe[ast_flag], mu_sun)[:2]
+        np.testing.assert_allclose(r[ast_flag], r_true, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(v[ast_flag], v_true, rtol=1e-9, atol=1e-16)
+
+def test_asteroids_rv_special_cases():
+    """Circular and equatorial rows follow the coe2rv conventions"""
+    catalog = AsteroidCatalog(number=[1, 2, 3], name=['circular', 'equatorial', 'retrograde'],
+                              a=[1.0, 1.5, 2.0], ecc=[0.0, 0.2, 0.1], inc=[0.3, 0.0, np.pi],
+                              raan=[0.5, 1.0, 2.0], argp=[1.2, 0.7, 0.4], M=[0.1, 2.0, 4.0],
+                              JD_epoch=[2458000.5]*3)
+    JD = 2458100.5
+    r, v = asteroids_rv(JD, catalog)
+    coe = asteroids_coe(JD, catalog)
+
+    for ast_flag in range(3):
+        r_true, v_true = coe2rv(*coe[ast_flag], mu_sun)[:2]
+        np.testing.assert_allclose(r[ast_flag], r_true, rtol=1e-9, atol=1e-12)
+        np.testing.assert_allclose(v[ast_flag], v_true, rtol=1e-9, atol=1e-16)
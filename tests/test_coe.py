@@ -1,5 +1,5 @@
 import numpy as np
-from keplerian_orbit.coe import coe2rv
+from keplerian_orbit.coe import coe2rv, coe2rv_vec, rv2coe
 
 def test_coe2rv_equatorial_circular():
     """Test COE to RV for equatorial circular orbit around Earth"""
@@ -79,4 +79,75 @@ def test_coe2rv_equatorial_circular_half():
     R_ijk, V_ijk, R_pqw, V_pqw = coe2rv(p,ecc,inc,raan,arg_p,nu, mu)
 
     np.testing.assert_array_almost_equal(R_ijk_true,R_ijk)
-    np.testing.assert_array_almost_equal(V_ijk_true,V_ijk) 
\ No newline at end of file
+    np.testing.assert_array_almost_equal(V_ijk_true,V_ijk) 
+
+def test_coe2rv_vec():
+    """Batched COE to RV matches coe2rv including the special cases"""
+    mu = 398600.5 # km^3 /sec^2
+    rng = np.random.RandomState(0)
+    N = 200
+
+    p = rng.uniform(6378.137, 50000.0, N)
+    ecc = rng.uniform(0.0, 0.9, N)
+    inc = rng.uniform(0.0, np.pi, N)
+    raan = rng.uniform(0.0, 2*np.pi, N)
+    arg_p = rng.uniform(0.0, 2*np.pi, N)
+    nu = rng.uniform(0.0, 2*np.pi, N)
+
+    # circular, equatorial and circular equatorial cases
+    ecc[:20] = 0.0
+    inc[10:30] = 0.0
+    inc[30:40] = np.pi
+
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv_vec(p,ecc,inc,raan,arg_p,nu,mu)
+
+    assert R_ijk.shape == (N, 3)
+    for ii in range(N):
+        R_true, V_true, R_pqw_true, V_pqw_true = coe2rv(p[ii],ecc[ii],inc[ii],raan[ii],arg_p[ii],nu[ii],mu)
+        np.testing.assert_allclose(R_ijk[ii], R_true, atol=1e-8*p[ii])
+        np.testing.assert_allclose(V_ijk[ii], V_true, atol=1e-10*np.linalg.norm(V_true))
+        np.testing.assert_allclose(R_pqw[ii], R_pqw_true, atol=1e-8*p[ii])
+        np.testing.assert_allclose(V_pqw[ii], V_pqw_true, atol=1e-10*np.linalg.norm(V_true))
+
+def test_rv2coe_round_trip():
+    """Random batch of elements survives coe2rv_vec followed by rv2coe"""
+    mu = 398600.5 # km^3 /sec^2
+    rng = np.random.RandomState(1)
+    N = 10000
+
+    p = rng.uniform(6378.137, 50000.0, N)
+    ecc = rng.uniform(0.001, 3.0, N)
+    inc = rng.uniform(0.001, np.pi - 0.001, N)
+    raan = rng.uniform(0.0, 2*np.pi, N)
+    arg_p = rng.uniform(0.0, 2*np.pi, N)
+    nu = rng.uniform(-np.pi/2, np.pi/2, N) # stay inside the hyperbolic asymptotes
+
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv_vec(p,ecc,inc,raan,arg_p,nu,mu)
+    p_out, ecc_out, inc_out, raan_out, arg_p_out, nu_out = rv2coe(R_ijk,V_ijk,mu)
+
+    np.testing.assert_allclose(p_out, p, rtol=1e-9)
+    np.testing.assert_allclose(ecc_out, ecc, rtol=1e-8)
+    np.testing.assert_allclose(inc_out, inc, atol=1e-9)
+    for out, true in ((raan_out, raan), (arg_p_out, arg_p), (nu_out, nu)):
+        np.testing.assert_allclose(np.sin(out - true), 0.0, atol=1e-7)
+        np.testing.assert_allclose(np.cos(out - true), 1.0)
+
+def test_rv2coe_special_cases():
+    """Circular and equatorial states follow the coe2rv conventions"""
+    mu = 398600.5 # km^3 /sec^2
+    p = 7000.0
+
+    # circular equatorial, nu is the true longitude
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv(p,0.0,0.0,0.0,0.0,1.0,mu)
+    coe = rv2coe(R_ijk,V_ijk,mu)
+    np.testing.assert_allclose(np.hstack(coe), (p, 0.0, 0.0, 0.0, 0.0, 1.0), atol=1e-9)
+
+    # circular inclined, nu is the argument of latitude
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv(p,0.0,0.5,2.0,0.0,1.0,mu)
+    coe = rv2coe(R_ijk,V_ijk,mu)
+    np.testing.assert_allclose(np.hstack(coe), (p, 0.0, 0.5, 2.0, 0.0, 1.0), atol=1e-9)
+
+    # elliptical equatorial (retrograde), arg_p is the longitude of periapsis
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv(p,0.2,np.pi,0.0,2.5,1.0,mu)
+    coe = rv2coe(R_ijk,V_ijk,mu)
+    np.testing.assert_allclose(np.hstack(coe), (p, 0.2, np.pi, 0.0, 2.5, 1.0), atol=1e-9)
@@ -0,0 +1,69 @@
+"""Pytest for element_cache.py"""
+import numpy as np
+from orbital_elements.element_cache import ElementCache, cached_planet_coe, cached_asteroid_coe
+from orbital_elements.planet_coe import planet_coe
+from orbital_elements.asteroid_coe import asteroid_coe
+from orbital_elements.catalog import builtin_catalog
+
+JD = 2458000.5
+
+def test_hits_inside_quantum():
+    """Epochs inside one quantum share the entry computed at the rounded JD"""
+    cache = cached_planet_coe(quantum=1.0/24)
+
+    coe = cache(JD, 2)
+    coe_near = cache(JD + 0.01, 2)
+
+    assert coe_near is coe
+    np.testing.assert_allclose(coe, planet_coe(JD, 2))
+    assert cache.cache_info() == (1, 1, 4096, 1)
+
+    cache(JD + 1.0/24, 2)
+    cache(JD, 3)
+    assert cache.cache_info().misses == 3
+
+def test_lru_eviction():
+    """The least recently used entry is evicted first"""
+    calls = []
+    def coe_func(JD, flag):
+        calls.append((JD, flag))
+        return (JD, flag)
+
+    cache = ElementCache(coe_func, quantum=None, maxsize=2)
+    cache(1.0, 0)
+    cache(2.0, 0)
+    cache(1.0, 0) # 1.0 is now the most recent
+    cache(3.0, 0) # evicts 2.0
+
+    assert len(cache) == 2
+    cache(1.0, 0)
+    cache(2.0, 0)
+    assert calls == [(1.0, 0), (2.0, 0), (3.0, 0), (2.0, 0)]
+
+def test_invalidate():
+    """Invalidate by body, JD range or everything"""
+    cache = cached_asteroid_coe(quantum=0.5)
+    for flag in range(3):
+        for k in range(4):
+            cache(JD + k, flag)
+
+    np.testing.assert_allclose(cache(JD, 1), asteroid_coe(JD, 1))
+    assert cache.invalidate(flag=1) == 4
+    assert cache.invalidate(JD_start=JD + 2) == 4
+    assert len(cache) == 4
+    assert cache.invalidate() == 4
+
+    cache(JD, 0)
+    assert cache.cache_info().misses == 13
+    cache.cache_clear()
+    assert cache.cache_info() == (0, 0, 4096, 0)
+
+def test_asteroid_catalog_key():
+    """Entries of different catalogs are kept apart"""
+    catalog = builtin_catalog.subset([2, 0])
+    cache = cached_asteroid_coe(catalog=catalog)
+
+    np.testing.assert_allclose(cache(JD, 0), asteroid_coe(JD, 0, catalog))
+    np.testing.assert_allclose(cache(JD, 0, builtin_catalog), asteroid_coe(JD, 0))
+    assert cache(JD, 0, catalog) is cache(JD, 0)
+    assert cache.cache_info() == (2, 2, 4096, 2)
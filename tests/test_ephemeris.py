@@ -0,0 +1,38 @@
+"""Pytest for ephemeris.py"""
+import numpy as np
+from orbital_elements.ephemeris import compile_ephemeris, clenshaw, mu_sun
+from orbital_elements.planet_coe import planet_coe
+from orbital_elements.asteroid_coe import asteroid_coe
+from keplerian_orbit.coe import coe2rv
+
+JD_start = 2458000.5
+
+def test_clenshaw_chebyshev_polynomials():
+    """Clenshaw summation reproduces T_k(x) = cos(k acos(x))"""
+    tau = np.linspace(-1, 1, 11)
+    for k in range(6):
+        coeffs = np.zeros((11, 3, 6))
+        coeffs[:, :, k] = 1.0
+        np.testing.assert_allclose(clenshaw(coeffs, tau), np.cos(k*np.arccos(tau))[:,np.newaxis]*np.ones(3), atol=1e-12)
+
+def test_compile_earth():
+    """Compiled Earth ephemeris matches planet_coe + coe2rv"""
+    ephem = compile_ephemeris(lambda JD: planet_coe(JD,2), JD_start, JD_start + 365)
+
+    assert ephem.max_error < 1e-9
+
+    JD = JD_start + np.linspace(0, 365, 17)
+    r_cheb = ephem.position(JD)
+    for ii in range(JD.shape[0]):
+        r_direct = coe2rv(*planet_coe(JD[ii],2), mu_sun)[0]
+        np.testing.assert_allclose(r_cheb[ii], r_direct, atol=1e-9)
+
+def test_compile_asteroid_velocity():
+    """Velocity from the derivative series matches the osculating velocity"""
+    ephem = compile_ephemeris(lambda JD: asteroid_coe(JD,2), JD_start, JD_start + 200)
+
+    r, v = ephem.state(JD_start + 100.25)
+    R_ijk, V_ijk, R_pqw, V_pqw = coe2rv(*asteroid_coe(JD_start + 100.25,2), mu_sun)
+
+    np.testing.assert_allclose(r, R_ijk, atol=1e-9)
+    np.testing.assert_allclose(v, V_ijk, rtol=1e-6, atol=1e-6*np.linalg.norm(V_ijk))
@@ -1,6 +1,7 @@
 """Pytest for keplerian_orbit.py"""
-from keplerian_orbit.keplerian_orbit import kepler_eq_E, nu2anom 
+from keplerian_orbit.keplerian_orbit import conic_orbit, conic_orbit_vec, conic_orbit_adaptive, kepler_eq_E, kepler_eq_E_vec, kepler_starter, nu2anom, tof_delta_t, tof_sequence
 import numpy as np
+import pytest
 
 # define an Earth GEO stationary orbit
 
@@ -44,6 +45,83 @@ def test_kepler_eq_E_pi():
 
     np.testing.assert_array_almost_equal((E_python,nu_python),(E_true,nu_true))
 
+def test_kepler_eq_E_vec():
+    """
+        Batched solver matches the matlab case
+    """
+    M = np.deg2rad(110)*np.ones(5)
+    ecc = 0.9
+    E_matlab = 2.475786297687611 
+    nu_matlab = 2.983273149717047
+
+    E_python, nu_python, count_python = kepler_eq_E_vec(M,ecc)
+
+    np.testing.assert_allclose(E_python, E_matlab)
+    np.testing.assert_allclose(nu_python, nu_matlab)
+
+def test_kepler_eq_E_vec_mixed():
+    """
+        Mixed circular/elliptical/parabolic/hyperbolic array matches the
+        scalar solver element by element
+    """
+    M = np.linspace(-2*np.pi, 2*np.pi, 13)[:,np.newaxis]
+    ecc = np.array([0.0, 0.1, 0.5, 0.9, 1.0, 1.2, 2.0, 5.0])
+
+    E_vec, nu_vec, count_vec = kepler_eq_E_vec(M,ecc)
+
+    assert E_vec.shape == (13, 8)
+    for ii in range(M.shape[0]):
+        for jj in range(ecc.shape[0]):
+            E, nu, count = kepler_eq_E(M[ii,0], ecc[jj])
+            np.testing.assert_allclose(E_vec[ii,jj], E, atol=1e-6)
+            np.testing.assert_allclose(nu_vec[ii,jj], nu, atol=1e-9)
+            assert count_vec[ii,jj] == count
+
+def test_kepler_eq_E_vec_halley():
+    """
+        Halley iteration from the Mikkola starter converges in at most two
+        steps for elliptical orbits
+    """
+    M = np.linspace(-2*np.pi, 2*np.pi, 101)[:,np.newaxis]
+    ecc = np.linspace(0.01, 0.99, 50)
+
+    E_newton, nu_newton, count_newton = kepler_eq_E_vec(M,ecc)
+    E_halley, nu_halley, count_halley = kepler_eq_E_vec(M,ecc,method='halley')
+
+    np.testing.assert_allclose(E_halley - ecc*np.sin(E_halley), M*np.ones_like(ecc), atol=1e-12)
+    np.testing.assert_allclose(nu_halley, nu_newton, atol=1e-9)
+    assert count_halley.max() <= 2
+    assert count_halley.mean() < count_newton.mean()
+
+def test_kepler_eq_E_vec_hyperbolic_large_M():
+    """
+        Hyperbolic elements far from periapsis converge with either method
+        and unconverged elements are flagged
+    """
+    M = np.array([88.0, -250.0, 1e4])
+    ecc = np.array([1.5, 1.2, 3.0])
+
+    for method in ('newton', 'halley'):
+        E, nu, count = kepler_eq_E_vec(M,ecc,tol=1e-12,method=method)
+        np.testing.assert_allclose(ecc*np.sinh(E) - E, M, rtol=1e-12)
+        assert count.max() <= 50
+
+    with pytest.warns(RuntimeWarning):
+        E, nu, count = kepler_eq_E_vec(M,ecc,tol=1e-12,max_iter=1,method='halley')
+    assert count.max() > 1
+
+def test_kepler_starter():
+    """
+        Mikkola starter is within a few mrad of the solution
+    """
+    M = np.linspace(-2*np.pi, 2*np.pi, 201)[:,np.newaxis]
+    ecc = np.linspace(0.0, 0.999, 40)
+
+    E_0 = kepler_starter(M,ecc)
+    E_true, nu_true, count = kepler_eq_E_vec(M,ecc,tol=1e-13)
+
+    np.testing.assert_allclose(E_0, E_true, atol=5e-3)
+
 def test_nu2anom():
     """
         A matlab test case which is copied here
@@ -95,3 +173,138 @@ def test_tof_delta_t():
     # make sure you get back to the same spot
 
     
+
+def test_tof_sequence():
+    """Warm started sequence matches independent tof_delta_t solves"""
+    mu = 398600.5 # km^3/sec^2
+    p = 10000.0
+    nu_0 = 1.0
+
+    time_span = np.arange(0, 20*86400, 600.0)
+    for ecc in (0.3, 0.0):
+        for t, E_f, M_f, nu_f in tof_sequence(p,ecc,mu,nu_0,time_span):
+            E_true, M_true, nu_true = tof_delta_t(p,ecc,mu,nu_0,t)
+            np.testing.assert_allclose((E_f, M_f, nu_f), (E_true, M_true, nu_true), atol=1e-6)
+
+def test_tof_delta_t_array():
+    """Array of times gives the same result as looping over scalar times"""
+    mu = 398600.5 # km^3/sec^2
+    p = 10000.0
+    ecc = 0.3
+    nu_0 = 1.0
+
+    time_span = np.linspace(0, 10*86400, 97)
+    E_f, M_f, nu_f = tof_delta_t(p,ecc,mu,nu_0,time_span)
+
+    assert E_f.shape == time_span.shape
+    for ii, t in enumerate(time_span):
+        E_true, M_true, nu_true = tof_delta_t(p,ecc,mu,nu_0,t)
+        np.testing.assert_allclose((E_f[ii], M_f[ii], nu_f[ii]), (E_true, M_true, nu_true), atol=1e-6)
+
+    # plain lists are accepted as well
+    np.testing.assert_allclose(tof_delta_t(p,ecc,mu,nu_0,list(time_span))[2], nu_f)
+
+def test_conic_orbit_vec():
+    """Batched orbit geometry matches conic_orbit body by body"""
+    p = np.array([0.4, 1.0, 5.2])
+    ecc = np.array([0.2, 0.0167, 0.6])
+    inc = np.array([0.12, 0.0, 0.3])
+    raan = np.array([0.8, 0.0, 1.7])
+    arg_p = np.array([0.5, 1.8, 4.0])
+    nu = np.array([0.3, 2.0, 5.5])
+
+    xyz, xyz_s = conic_orbit_vec(p,ecc,inc,raan,arg_p,nu)
+
+    assert xyz.shape == (3, 1000, 3)
+    for ii in range(3):
+        # conic_orbit starts its grid at nu_i so compare from nu = 0
+        (x,y,z,xs,ys,zs) = conic_orbit(p[ii],ecc[ii],inc[ii],raan[ii],arg_p[ii],0.0,0.0)
+        np.testing.assert_allclose(xyz[ii], np.stack((x,y,z), axis=-1), atol=1e-12)
+
+        (x,y,z,xs,ys,zs) = conic_orbit(p[ii],ecc[ii],inc[ii],raan[ii],arg_p[ii],nu[ii],nu[ii])
+        np.testing.assert_allclose(xyz_s[ii], (xs,ys,zs), atol=1e-12)
+
+def test_conic_orbit_adaptive_chord_error():
+    """Chords between adaptive samples stay within tol of the orbit"""
+    p = np.array([1.0, 30.0, 0.19])
+    ecc = np.array([0.0167, 0.009, 0.9])
+    tol = 1e-3
+
+    xyz, offsets, xyz_s = conic_orbit_adaptive(p,ecc,0.1,0.2,0.3,0.0,tol=tol)
+    dense, dense_s = conic_orbit_vec(p,ecc,0.1,0.2,0.3,0.0,step=20000)
+
+    assert offsets.shape == (4,)
+    np.testing.assert_allclose(xyz_s, dense_s)
+    for ii in range(3):
+        A = xyz[offsets[ii]:offsets[ii+1]-1]
+        B = xyz[offsets[ii]+1:offsets[ii+1]]
+        # closed revolution
+        np.testing.assert_allclose(A[0], B[-1], atol=1e-12)
+
+        # distance of every dense point to the nearest chord
+        AB = B - A
+        dist = np.empty(dense.shape[1])
+        for jj in range(0, dense.shape[1], 2000):
+            P = dense[ii, jj:jj+2000, np.newaxis, :]
+            t = np.clip(np.sum((P - A)*AB, axis=2)/np.sum(AB*AB, axis=1), 0, 1)
+            dist[jj:jj+2000] = np.min(np.linalg.norm(P - (A + t[..., np.newaxis]*AB), axis=2), axis=1)
+        assert dist.max() < 1.05*tol
+
+def test_conic_orbit_adaptive_lod():
+    """Point count grows with zoom and respects a total budget"""
+    p = np.linspace(0.5, 30, 50)
+    ecc = np.linspace(0.0, 0.5, 50)
+
+    xyz_1, offsets_1, xyz_s = conic_orbit_adaptive(p,ecc,0.1,0.2,0.3,0.0)
+    xyz_4, offsets_4, xyz_s = conic_orbit_adaptive(p,ecc,0.1,0.2,0.3,0.0,zoom=4.0)
+    xyz_b, offsets_b, xyz_s = conic_orbit_adaptive(p,ecc,0.1,0.2,0.3,0.0,max_points=2000)
+
+    assert offsets_4[-1] > 1.8*offsets_1[-1]
+    assert offsets_b[-1] <= 2000
+    assert np.all(np.diff(offsets_b) >= 8)
+
+def test_conic_orbit_hyperbolic():
+    """Hyperbolic orbit is drawn out to r_max inside the asymptotes"""
+    p = 2.0
+    ecc = 1.5
+    r_max = 8.0
+
+    (x,y,z,xs,ys,zs) = conic_orbit(p,ecc,0.0,0.0,0.0,0.5,0.5,r_max=r_max)
+    radius = np.sqrt(x**2 + y**2 + z**2)
+
+    np.testing.assert_allclose(radius[[0,-1]], r_max)
+    np.testing.assert_allclose(radius.min(), p/(1+ecc), rtol=1e-5)
+    np.testing.assert_allclose(np.sqrt(xs**2 + ys**2 + zs**2), p/(1+ecc*np.cos(0.5)))
+
+def test_conic_orbit_parabolic():
+    """Parabolic orbit defaults to 10 times the periapsis radius"""
+    p = 2.0
+    ecc = 1.0
+
+    (x,y,z,xs,ys,zs) = conic_orbit(p,ecc,0.3,0.2,0.1,2*np.pi-0.5,2*np.pi-0.5)
+    radius = np.sqrt(x**2 + y**2 + z**2)
+
+    np.testing.assert_allclose(radius[[0,-1]], 10*p/2)
+    assert np.all(np.isfinite(radius))
+
+def test_conic_orbit_vec_mixed_conics():
+    """Mixed elliptical, parabolic and hyperbolic orbits in one call"""
+    p = np.array([1.0, 2.0, 2.0, 3.0])
+    ecc = np.array([0.3, 1.0, 1.5, 4.0])
+    inc = np.array([0.1, 0.2, 0.3, 0.4])
+    raan = np.array([0.5, 1.0, 1.5, 2.0])
+    arg_p = np.array([2.0, 1.0, 0.5, 0.1])
+    nu = np.array([0.1, 5.0, 0.3, 6.0])
+
+    xyz, xyz_s = conic_orbit_vec(p,ecc,inc,raan,arg_p,nu,r_max=20.0)
+
+    assert np.all(np.isfinite(xyz))
+    for ii in range(1, 4):
+        (x,y,z,xs,ys,zs) = conic_orbit(p[ii],ecc[ii],inc[ii],raan[ii],arg_p[ii],nu[ii],nu[ii],r_max=20.0)
+        np.testing.assert_allclose(xyz[ii], np.stack((x,y,z), axis=-1), atol=1e-9)
+        np.testing.assert_allclose(xyz_s[ii], (xs,ys,zs), atol=1e-12)
+
+    xyz, offsets, xyz_s_adaptive = conic_orbit_adaptive(p,ecc,inc,raan,arg_p,nu,r_max=20.0)
+    np.testing.assert_allclose(xyz_s_adaptive, xyz_s)
+    for ii in range(1, 4):
+        np.testing.assert_allclose(np.linalg.norm(xyz[[offsets[ii], offsets[ii+1]-1]], axis=1), 20.0)
@@ -0,0 +1,88 @@
+"""Pytest for moid.py"""
+import numpy as np
+from keplerian_orbit.moid import moid
+from orbital_elements.close_approach import catalog_moid, find_close_approaches
+from orbital_elements.catalog import builtin_catalog
+from orbital_elements.asteroid_coe import asteroid_coe
+from orbital_elements.planet_coe import planet_coe
+from orbital_elements.ephemeris import mu_sun
+from keplerian_orbit.coe import coe2rv
+from utilities.attitude import pqw_to_inertial
+
+JD = 2458000.5
+
+def brute_force_moid(coe_1, coe_2, n=600):
+    """Smallest distance between two dense grids of points"""
+    E = np.linspace(0, 2*np.pi, n, endpoint=False)
+    points = []
+    for (p, ecc, inc, raan, argp) in (coe_1[:5], coe_2[:5]):
+        a = p/(1 - ecc**2)
+        dcm = pqw_to_inertial(raan, inc, argp)
+        points.append(np.outer(a*(np.cos(E) - ecc), dcm[:, 0]) + np.outer(a*np.sqrt(1 - ecc**2)*np.sin(E), dcm[:, 1]))
+    return np.min(np.sqrt(np.sum((points[0][:, np.newaxis] - points[1][np.newaxis])**2, axis=-1)))
+
+def test_coplanar_circles():
+    """Concentric circles are their difference in radius apart"""
+    dist, nu_1, nu_2 = moid((1.5, 0, 0.1, 0.2, 0.3, 0), (1.0, 0, 0.1, 0.2, 0.3, 0))
+
+    np.testing.assert_allclose(dist, 0.5)
+
+def test_against_brute_force():
+    """Random orbits against the planets match a dense grid search"""
+    rng = np.random.default_rng(0)
+    N = 20
+    a = rng.uniform(0.6, 3, N)
+    ecc = rng.uniform(0, 0.8, N)
+    coe = np.stack((a*(1 - ecc**2), ecc, rng.uniform(0, 1.5, N), rng.uniform(0, 2*np.pi, N),
+                    rng.uniform(0, 2*np.pi, N), np.zeros(N)), axis=-1)
+
+    for planet_flag in (2, 4):
+        planet = planet_coe(JD, planet_flag)
+        dist, nu_1, nu_2 = moid(coe, planet, chunk_size=7)
+        dist_true = np.array([brute_force_moid(coe[k], planet) for k in range(N)])
+
+        # the grid search can only overestimate the MOID
+        assert np.all(dist <= dist_true + 1e-9)
+        np.testing.assert_allclose(dist, dist_true, atol=2e-3)
+
+        # the anomalies give points that are dist apart
+        for k in range(N):
+            r_1 = _position(coe[k], nu_1[k])
+            r_2 = _position(planet, nu_2[k])
+            np.testing.assert_allclose(np.linalg.norm(r_1 - r_2), dist[k], atol=1e-9)
+
+def test_catalog_moid():
+    """Catalog screening uses the persisted invariants with the same result"""
+    dist, nu_ast, nu_planet = catalog_moid(JD, builtin_catalog)
+    coe = np.array([asteroid_coe(JD, ast_flag) for ast_flag in range(3)])
+    dist_true = moid(coe, planet_coe(JD, 2))[0]
+
+    np.testing.assert_allclose(dist, dist_true, atol=1e-12)
+    assert np.all(dist < 0.05) # all three are near Earth asteroids
+
+    dist_sub = catalog_moid(JD, builtin_catalog, rows=[2, 0], chunk_size=1)[0]
+    np.testing.assert_allclose(dist_sub, dist[[2, 0]])
+
+def test_close_approaches():
+    """Events match a dense search around the minima"""
+    events = find_close_approaches(2452900.5, 2455000.5, builtin_catalog, dist_max=0.05, step_days=2.0)
+
+    # Itokawa in June 2004, Bennu in September 2005 and 2008 EV5 in December 2008
+    np.testing.assert_array_equal(events['number'], [25143, 101955, 341843])
+    assert np.all(np.diff(events['JD']) > 0)
+
+    for event in events:
+        JD_dense = event['JD'] + np.linspace(-0.5, 0.5, 201)
+        dist = [np.linalg.norm(coe2rv(*asteroid_coe(JD_curr, event['row']), mu_sun)[0]
+                               - coe2rv(*planet_coe(JD_curr, 2), mu_sun)[0]) for JD_curr in JD_dense]
+        assert event['dist'] <= np.min(dist) + 1e-10
+        np.testing.assert_allclose(event['dist'], np.min(dist), rtol=1e-6)
+
+    # a tight distance limit prunes every object by its MOID
+    assert find_close_approaches(2452900.5, 2455000.5, builtin_catalog, dist_max=1e-3).shape == (0,)
+
+def _position(coe, nu):
+    p, ecc, inc, raan, argp = coe[:5]
+    r = p/(1 + ecc*np.cos(nu))
+    dcm = pqw_to_inertial(raan, inc, argp)
+    return dcm[:, 0]*r*np.cos(nu) + dcm[:, 1]*r*np.sin(nu)
@@ -0,0 +1,71 @@
+"""Pytest for orbit.py"""
+import numpy as np
+from keplerian_orbit.orbit import KeplerOrbit
+from keplerian_orbit.keplerian_orbit import tof_delta_t
+from keplerian_orbit.coe import coe2rv
+from keplerian_orbit.universal import universal_propagate
+
+mu = 398600.5 # km^3/sec^2
+coe = (10000.0, 0.3, 0.5, 1.0, 2.0, 0.7)
+
+def test_kepler_orbit_slots():
+    """Orbit objects do not carry a per instance dict"""
+    orbit = KeplerOrbit(*coe, mu=mu)
+
+    assert not hasattr(orbit, '__dict__')
+
+def test_state_at():
+    """Cached invariants give the same state as tof_delta_t and coe2rv"""
+    orbit = KeplerOrbit(*coe, mu=mu)
+    p, ecc, inc, raan, arg_p, nu = coe
+
+    for t in (0.0, 1000.0, 5e4, 3e5):
+        nu_f = tof_delta_t(p,ecc,mu,nu,t)[2]
+        R_ijk, V_ijk, R_pqw, V_pqw = coe2rv(p,ecc,inc,raan,arg_p,nu_f,mu)
+
+        r, v = orbit.state_at(t)
+        np.testing.assert_allclose(r, R_ijk, rtol=1e-6)
+        np.testing.assert_allclose(v, V_ijk, rtol=1e-6)
+
+def test_state_at_hyperbolic():
+    """Hyperbolic states far from periapsis match the universal variable propagation"""
+    orbit = KeplerOrbit(10000.0, 1.5, 0.3, 1.0, 2.0, 0.4, mu=mu)
+    r_0, v_0 = orbit.state_at(0.0)
+
+    for t in (1e3, 1e5, -2e4):
+        r_true, v_true = universal_propagate(r_0, v_0, mu, t)
+        r_true, v_true = r_true[0], v_true[0]
+
+        r, v = orbit.state_at(t)
+        np.testing.assert_allclose(r, r_true, rtol=1e-6)
+        np.testing.assert_allclose(v, v_true, rtol=1e-6)
+
+    r, v = orbit.states_at([1e3, 1e5])
+    np.testing.assert_allclose(r[1], orbit.state_at(1e5)[0])
+
+def test_states_at():
+    """Batched states match the single epoch states"""
+    orbit = KeplerOrbit(*coe, mu=mu)
+    times = np.linspace(0, 3e5, 21)
+
+    r, v = orbit.states_at(times)
+
+    assert r.shape == (21, 3)
+    for ii, t in enumerate(times):
+        r_t, v_t = orbit.state_at(t)
+        np.testing.assert_allclose(r[ii], r_t, rtol=1e-6)
+        np.testing.assert_allclose(v[ii], v_t, rtol=1e-6)
+
+def test_polyline():
+    """Polyline points lie on the conic and in the orbit plane"""
+    orbit = KeplerOrbit(*coe, mu=mu)
+    xyz = orbit.polyline(50)
+
+    h = np.cross(*orbit.state_at(0.0))
+    radius = np.linalg.norm(xyz, axis=1)
+    a = orbit.a
+
+    assert xyz.shape == (50, 3)
+    np.testing.assert_allclose(xyz.dot(h), 0.0, atol=1e-6*np.linalg.norm(h)*a)
+    assert np.all(radius >= a*(1-coe[1]) - 1e-6)
+    assert np.all(radius <= a*(1+coe[1]) + 1e-6)
@@ -0,0 +1,88 @@
+"""Pytest for planet_coe.py"""
+import numpy as np
+from orbital_elements.planet_coe import (planet_coe, planets_coe, planets_coe_series, planet_approx,
+                                         planet_table, planet_table_coarse, planet_approx_table)
+
+JD = 2458000.5
+
+def test_planet_approx_table():
+    """Table lookup returns the 16 element values of each planet"""
+    earth = planet_approx(JD,2)
+
+    assert len(earth) == 16
+    np.testing.assert_allclose(earth[:4], (1.00000261, 0.00000562, 0.01671123, -0.00004392))
+    assert planet_table.shape == (9,)
+
+def test_planets_coe_matches_planet_coe():
+    """All planets in one call match the per planet function"""
+    coe = planets_coe(JD)
+
+    assert coe.shape == (9, 6)
+    for planet_flag in range(9):
+        coe_true = np.array(planet_coe(JD,planet_flag))
+        np.testing.assert_allclose(coe[planet_flag,:5], coe_true[:5], rtol=1e-12)
+        np.testing.assert_allclose(np.cos(coe[planet_flag,5] - coe_true[5]), 1.0)
+        np.testing.assert_allclose(np.sin(coe[planet_flag,5] - coe_true[5]), 0.0, atol=1e-6)
+
+def test_planets_coe_subset():
+    """A subset of planet flags selects the matching rows"""
+    coe = planets_coe(JD)
+    coe_inner = planets_coe(JD, planet_flags=[0, 1, 2, 3])
+
+    np.testing.assert_allclose(coe_inner, coe[:4])
+
+def test_planets_coe_time_series():
+    """An array of JD gives one (N_bodies, 6) block per epoch"""
+    JD_series = JD + np.arange(48)/24.0
+    coe = planets_coe(JD_series)
+
+    assert coe.shape == (48, 9, 6)
+    for k in (0, 17, 47):
+        np.testing.assert_allclose(coe[k], planets_coe(JD_series[k]), rtol=1e-12)
+
+    earth = planets_coe(JD_series, planet_flags=2)
+    assert earth.shape == (48, 6)
+    np.testing.assert_allclose(earth, coe[:, 2], rtol=1e-12)
+
+    np.testing.assert_allclose(planets_coe(list(JD_series[:2])), coe[:2])
+
+def test_planets_coe_series_chunks():
+    """The chunked generator covers the series and can output float32"""
+    JD_series = JD + np.arange(100)/24.0
+    coe = planets_coe(JD_series)
+
+    chunks = list(planets_coe_series(JD_series, chunk_size=30, dtype=np.float32))
+
+    assert [c.shape[0] for j, c in chunks] == [30, 30, 30, 10]
+    assert chunks[0][1].dtype == np.float32
+    np.testing.assert_allclose(np.concatenate([j for j, c in chunks]), JD_series)
+    np.testing.assert_allclose(np.concatenate([c for j, c in chunks]), coe, rtol=1e-6)
+
+def test_coarse_model():
+    """Dates outside 1800-2050 use the coarse table with the Table 2b terms"""
+    JD_1000AD = 2086307.5
+
+    assert planet_approx_table(JD_1000AD) is planet_table_coarse
+    assert planet_approx_table(JD) is planet_table
+    np.testing.assert_allclose(planet_approx(JD_1000AD,4)[12:], (-0.00012452, 0.06064060, 38.35125000, -0.35635438))
+
+    coe = planets_coe(JD_1000AD)
+    for planet_flag in range(9):
+        coe_true = np.array(planet_coe(JD_1000AD,planet_flag))
+        np.testing.assert_allclose(coe[planet_flag,:5], coe_true[:5], rtol=1e-12)
+
+    # the two models join closely at the 1800AD boundary
+    coe_edge = planets_coe(np.array([2378496.5, 2378497.5]))
+    np.testing.assert_allclose(coe_edge[0,:,:2], coe_edge[1,:,:2], rtol=1e-3, atol=2e-3)
+
+def test_mixed_models_by_mask():
+    """An array spanning both models selects the table per epoch"""
+    JD_series = np.array([2086307.5, 2378496.5, JD, 2469809.5, 2816000.5])
+    coe = planets_coe(JD_series)
+
+    assert coe.shape == (5, 9, 6)
+    for k in range(5):
+        np.testing.assert_allclose(coe[k], planets_coe(JD_series[k]), rtol=1e-12)
+
+    earth = planets_coe(JD_series, planet_flags=2)
+    np.testing.assert_allclose(earth, coe[:, 2], rtol=1e-12)
@@ -0,0 +1,94 @@
+"""Pytest for spatial_index.py"""
+import numpy as np
+import pytest
+from utilities.spatial_index import SpatialGrid
+from orbital_elements.asteroid_coe import asteroids_rv
+from orbital_elements.catalog import builtin_catalog
+
+rng = np.random.default_rng(0)
+r = rng.uniform(-3, 3, (2000, 3))
+
+def brute_pairs(r, radius):
+    dist = np.sqrt(np.sum((r[:, np.newaxis] - r[np.newaxis])**2, axis=-1))
+    i, j = np.nonzero(np.triu(dist <= radius, 1))
+    return np.stack((i, j), axis=-1)
+
+def test_query_radius():
+    """Radius queries match a direct distance check"""
+    grid = SpatialGrid(r, 0.25)
+    point = np.array([0.3, -1.2, 2.0])
+
+    idx, dist = grid.query_radius(point, 0.6, return_distance=True)
+    dist_true = np.sqrt(np.sum((r - point)**2, axis=1))
+
+    np.testing.assert_array_equal(idx, np.flatnonzero(dist_true <= 0.6))
+    np.testing.assert_allclose(dist, dist_true[idx])
+
+def test_query_knn():
+    """Nearest neighbours match a full sort, also beyond the first cell"""
+    grid = SpatialGrid(r, 0.1)
+    point = np.array([5.0, 0.0, 0.0])
+
+    idx, dist = grid.query_knn(point, 7)
+    dist_true = np.sqrt(np.sum((r - point)**2, axis=1))
+
+    np.testing.assert_array_equal(idx, np.argsort(dist_true)[:7])
+    np.testing.assert_allclose(dist, np.sort(dist_true)[:7])
+
+def test_far_query_small_cells():
+    """A far point with tiny cells only visits the occupied cells"""
+    r_many = rng.uniform(-3, 3, (20000, 3))
+    grid = SpatialGrid(r_many, 0.01)
+    point = np.array([6.0, 0.0, 0.0])
+
+    idx, dist = grid.query_knn(point, 3)
+    dist_true = np.sqrt(np.sum((r_many - point)**2, axis=1))
+
+    np.testing.assert_array_equal(idx, np.argsort(dist_true)[:3])
+    np.testing.assert_allclose(dist, np.sort(dist_true)[:3])
+    np.testing.assert_array_equal(grid.query_radius(point, 3.5), np.flatnonzero(dist_true <= 3.5))
+    assert grid.query_radius(point, 1.0).shape == (0,)
+
+def test_cell_range():
+    """Cells beyond the packed key range raise instead of aliasing"""
+    with pytest.raises(ValueError):
+        SpatialGrid(r, 1e-6)
+
+    grid = SpatialGrid(r, 1e-5)
+    idx, dist = grid.query_knn(r[10] + 1e-6, 2)
+    dist_true = np.sqrt(np.sum((r - r[10] - 1e-6)**2, axis=1))
+    np.testing.assert_array_equal(idx, np.argsort(dist_true)[:2])
+
+    with pytest.raises(ValueError):
+        grid.update(10*r)
+    np.testing.assert_array_equal(grid.positions, r)
+
+def test_query_pairs():
+    """Close pairs match the O(N^2) search for radii above and below the cell size"""
+    grid = SpatialGrid(r, 0.2)
+
+    for radius in (0.1, 0.35):
+        np.testing.assert_array_equal(grid.query_pairs(radius), brute_pairs(r, radius))
+
+def test_incremental_update():
+    """Updating positions gives the same answers as rebuilding the index"""
+    grid = SpatialGrid(r, 0.2)
+    r_new = r + rng.normal(0, 0.01, r.shape)
+
+    moved = grid.update(r_new)
+    rebuilt = SpatialGrid(r_new, 0.2)
+
+    assert 0 < moved < len(r)
+    assert grid.update(r_new) == 0
+    np.testing.assert_array_equal(grid._sorted_keys, rebuilt._sorted_keys)
+    np.testing.assert_array_equal(grid.query_pairs(0.15), brute_pairs(r_new, 0.15))
+    np.testing.assert_array_equal(grid.query_radius([0, 0, 0], 1.0), rebuilt.query_radius([0, 0, 0], 1.0))
+
+def test_catalog_positions():
+    """The index works on the batched catalog states"""
+    r_ast, v_ast = asteroids_rv(2458000.5, builtin_catalog)
+    grid = SpatialGrid(r_ast, 0.5)
+
+    idx, dist = grid.query_knn(r_ast[2], 1)
+    np.testing.assert_array_equal(idx, [2])
+    np.testing.assert_allclose(dist, [0.0])
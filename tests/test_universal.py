@@ -0,0 +1,93 @@
+"""Pytest for universal.py"""
+import numpy as np
+import pytest
+from keplerian_orbit.keplerian_orbit import tof_delta_t, kepler_eq_E_vec, nu2anom, nu2anom_vec
+from keplerian_orbit.universal import stumpff, universal_propagate, tof_universal
+
+mu = 398600.5 # km^3/sec^2
+
+def test_stumpff_limits():
+    """Stumpff functions are continuous through psi = 0"""
+    psi = np.array([-1e-5, -1e-7, 0.0, 1e-7, 1e-5])
+    c2, c3 = stumpff(psi)
+
+    np.testing.assert_allclose(c2, 0.5, atol=1e-6)
+    np.testing.assert_allclose(c3, 1.0/6.0, atol=1e-6)
+
+def test_stumpff_values():
+    """Compare against the closed form for a few values"""
+    c2, c3 = stumpff(np.array([np.pi**2, -1.0]))
+
+    np.testing.assert_allclose(c2, (2.0/np.pi**2, np.cosh(1.0) - 1.0))
+    np.testing.assert_allclose(c3, (1.0/np.pi**2, np.sinh(1.0) - 1.0))
+
+def test_nu2anom_vec():
+    """Batched anomaly conversion matches nu2anom"""
+    nu = np.linspace(-3, 3, 25)
+    for ecc in (0.0, 0.3, 0.9, 1.0, 1.5):
+        E, M = nu2anom_vec(nu, ecc)
+        for ii in range(nu.shape[0]):
+            np.testing.assert_allclose((E[ii], M[ii]), nu2anom(nu[ii], ecc), atol=1e-12)
+
+def test_tof_universal_elliptical():
+    """Universal engine matches the Kepler equation path"""
+    p = 10000.0
+    time_span = np.linspace(0, 5e5, 50)
+    for ecc in (0.0, 0.3, 0.9):
+        E_k, M_k, nu_k = tof_delta_t(p,ecc,mu,1.0,time_span)
+        E_u, M_u, nu_u = tof_delta_t(p,ecc,mu,1.0,time_span,method='universal')
+
+        np.testing.assert_allclose(np.cos(nu_u - nu_k), 1.0)
+        np.testing.assert_allclose(np.sin(nu_u - nu_k), 0.0, atol=1e-9)
+        np.testing.assert_allclose(np.sin(M_u - M_k), 0.0, atol=1e-9)
+
+def test_tof_universal_near_parabolic():
+    """Near parabolic ellipses converge and match the Kepler equation path"""
+    p = 10000.0
+    time_span = np.arange(556)*3600.0
+    for ecc in (0.97, 0.99, 0.999):
+        E_k, M_k, nu_k = tof_delta_t(p,ecc,mu,2.5,time_span)
+        E_u, M_u, nu_u = tof_delta_t(p,ecc,mu,2.5,time_span,method='universal')
+
+        np.testing.assert_allclose(np.sin(nu_u - nu_k), 0.0, atol=1e-6)
+
+    E_u, M_u, nu_u = tof_universal(31441.832, 0.97277, mu, -1.0372, 376786.0)
+    E_k, M_k, nu_k = tof_delta_t(31441.832, 0.97277, mu, -1.0372, 376786.0)
+    np.testing.assert_allclose(nu_u, nu_k, atol=1e-9)
+
+def test_universal_propagate_max_iter():
+    """Elements that run out of iterations are flagged"""
+    with pytest.warns(RuntimeWarning):
+        universal_propagate([7000.0, 0, 0], [0, 8.0, 0], mu, 3600.0, max_iter=0)
+
+def test_tof_universal_hyperbolic():
+    """Hyperbolic propagation matches the hyperbolic Kepler equation"""
+    p = 10000.0
+    ecc = 1.5
+    nu_0 = -1.0
+    time_span = np.linspace(-2e4, 5e4, 50)
+
+    H_0, M_0 = nu2anom(nu_0, ecc)
+    n = np.sqrt(mu/np.absolute(p/(1-ecc**2))**3)
+    H_true, nu_true, count = kepler_eq_E_vec(M_0 + n*time_span, ecc)
+
+    E_u, M_u, nu_u = tof_universal(p,ecc,mu,nu_0,time_span)
+
+    np.testing.assert_allclose(nu_u, nu_true, atol=1e-9)
+    np.testing.assert_allclose(M_u, M_0 + n*time_span, atol=1e-9)
+
+def test_universal_propagate_mixed():
+    """Mixed conics conserve energy and angular momentum in one call"""
+    ecc = np.array([0.0, 0.5, 0.99, 1.0, 1.01, 3.0])
+    p = 8000.0*np.ones_like(ecc)
+    nu = np.array([0.0, 1.0, -2.0, 0.5, -0.5, 0.2])
+
+    r0 = (p/(1+ecc*np.cos(nu)))[:,np.newaxis]*np.stack((np.cos(nu), np.sin(nu), np.zeros_like(nu)), axis=-1)
+    v0 = np.sqrt(mu/p)[:,np.newaxis]*np.stack((-np.sin(nu), ecc+np.cos(nu), np.zeros_like(nu)), axis=-1)
+
+    r, v = universal_propagate(r0, v0, mu, 3600.0)
+
+    energy_0 = np.sum(v0**2, axis=1)/2 - mu/np.linalg.norm(r0, axis=1)
+    energy = np.sum(v**2, axis=1)/2 - mu/np.linalg.norm(r, axis=1)
+    np.testing.assert_allclose(energy, energy_0, rtol=1e-8, atol=1e-10)
+    np.testing.assert_allclose(np.cross(r, v), np.cross(r0, v0), rtol=1e-8)
@@ -69,4 +69,52 @@ def test_ROT3_90():
     # negative 90 rotations
     tst.assert_array_almost_equal(np.dot(x_axis,att.ROT3(neg_90)),-y_axis)
     tst.assert_array_almost_equal(np.dot(y_axis,att.ROT3(neg_90)),x_axis)
-    tst.assert_array_almost_equal(np.dot(z_axis,att.ROT3(neg_90)),z_axis)
\ No newline at end of file
+    tst.assert_array_almost_equal(np.dot(z_axis,att.ROT3(neg_90)),z_axis)
+
+def test_ROT_vec_matches_scalar():
+    """Stacked rotations match the scalar rotations element by element"""
+    angles = np.linspace(-2*np.pi, 2*np.pi, 7)
+
+    for rot, rot_vec in ((att.ROT1, att.ROT1_vec), (att.ROT2, att.ROT2_vec), (att.ROT3, att.ROT3_vec)):
+        stack = rot_vec(angles)
+        tst.assert_equal(stack.shape, (7, 3, 3))
+        for ii, a in enumerate(angles):
+            tst.assert_array_almost_equal(stack[ii], rot(a))
+
+def test_pqw_to_inertial():
+    """Closed form 3-1-3 matrix matches the product of elementary rotations"""
+    raan, inc, arg_p = 1.1, 0.4, -2.3
+    dcm_true = att.ROT3(-raan).dot(att.ROT1(-inc)).dot(att.ROT3(-arg_p))
+
+    tst.assert_array_almost_equal(att.pqw_to_inertial(raan, inc, arg_p), dcm_true)
+
+def test_pqw_to_inertial_vec():
+    """Array inputs give a stack of rotation matrices"""
+    raan = np.linspace(0, 2*np.pi, 5)
+    inc = np.linspace(0, np.pi, 5)
+    arg_p = np.linspace(-1, 1, 5)
+
+    dcm = att.pqw_to_inertial(raan, inc, arg_p)
+    dcm_true = np.matmul(np.matmul(att.ROT3_vec(-raan), att.ROT1_vec(-inc)), att.ROT3_vec(-arg_p))
+
+    tst.assert_array_almost_equal(dcm, dcm_true)
+    tst.assert_array_almost_equal(np.matmul(dcm, np.transpose(dcm, (0, 2, 1))), np.tile(np.identity(3), (5, 1, 1)))
+
+def test_normalize_array_matches_scalar():
+    """Array normalize gives the same values as the scalar path"""
+    nums = np.concatenate((np.linspace(-1000, 1000, 401), np.arange(-720, 721, 90.0)))
+
+    for lower, upper, b in ((-180, 180, False), (0, 360, False), (-90, 90, True)):
+        res = att.normalize(nums, lower, upper, b)
+        tst.assert_equal(res.shape, nums.shape)
+        tst.assert_array_equal(res, [att.normalize(num, lower, upper, b) for num in nums])
+
+def test_normalize_array_2d():
+    """Angles in any shape are wrapped to [0, 2 pi)"""
+    rng = np.random.RandomState(0)
+    nums = rng.uniform(-20, 20, (10, 7))
+    res = att.normalize(nums, 0, 2*np.pi)
+
+    tst.assert_equal(res.shape, (10, 7))
+    assert np.all((res >= 0) & (res < 2*np.pi))
+    tst.assert_array_almost_equal(np.cos(res), np.cos(nums))
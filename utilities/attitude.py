@@ -6,8 +6,8 @@ def normalize(num, lower=0, upper=360, b=False):
 
     Parameters
     ----------
-    num : float
-        The number to be normalized.
+    num : float or array_like
+        The number (or array of numbers) to be normalized.
     lower : int
         Lower limit of range. Default is 0.
     upper : int
@@ -21,8 +21,9 @@ def normalize(num, lower=0, upper=360, b=False):
 
     Returns
     -------
-    n : float
-        A number in the range [lower, upper) or [lower, upper].
+    n : float or ndarray
+        A number in the range [lower, upper) or [lower, upper]. An ndarray
+        of the same shape is returned for array input.
 
     Raises
     ------
@@ -83,6 +84,10 @@ def normalize(num, lower=0, upper=360, b=False):
     -90.0
     >>> normalize(271, -90, 90, b=True)
     -89.0
+    >>> normalize([-270, 181, 368.5], -180, 180)
+    array([  90. , -179. ,    8.5])
+    >>> normalize([-100, 100, 181], -90, 90, b=True)
+    array([-80.,  80.,  -1.])
     """
     if lower >= upper:
         ValueError("lower must be lesser than upper")
@@ -93,26 +98,52 @@ def normalize(num, lower=0, upper=360, b=False):
         if not (lower + upper == 0):
             raise ValueError('When b=True range must be symmetric about 0.')
 
-    from math import floor, ceil
+    # scalars skip the array machinery, which costs more than the math
+    if isinstance(num, (int, float, np.number)) or np.ndim(num) == 0:
+        return _normalize_scalar(float(num), lower, upper, b)
+
     # abs(num + upper) and abs(num - lower) are needed, instead of
     # abs(num), since the lower and upper limits need not be 0. We need
     # to add half size of the range, so that the final result is lower +
     # <value> or upper - <value>, respectively.
-    res = num
+    # Each step is applied with np.where so arrays are handled without a
+    # python loop.
+    num = np.asarray(num, dtype=float)
+    total_length = abs(lower) + abs(upper)
     if not b:
+        wrap = (num > upper) | (num == lower)
+        num = np.where(wrap, lower + np.mod(np.absolute(num + upper), total_length), num)
+        wrap = (num < lower) | (num == upper)
+        num = np.where(wrap, upper - np.mod(np.absolute(num - lower), total_length), num)
+
+        res = np.where(num == upper, lower, num)
+    else:
+        num = np.where(num < -total_length,
+                       num + np.ceil(num / (-2 * total_length)) * 2 * total_length, num)
+        num = np.where(num > total_length,
+                       num - np.floor(num / (2 * total_length)) * 2 * total_length, num)
+        num = np.where(num > upper, total_length - num, num)
+        num = np.where(num < lower, -total_length - num, num)
+
         res = num
+
+    return res
+
+def _normalize_scalar(num, lower, upper, b):
+    """Same steps as normalize for a single float"""
+    total_length = abs(lower) + abs(upper)
+    if not b:
         if num > upper or num == lower:
-            num = lower + abs(num + upper) % (abs(lower) + abs(upper))
+            num = lower + abs(num + upper) % total_length
         if num < lower or num == upper:
-            num = upper - abs(num - lower) % (abs(lower) + abs(upper))
+            num = upper - abs(num - lower) % total_length
 
         res = lower if num == upper else num
     else:
-        total_length = abs(lower) + abs(upper)
         if num < -total_length:
-            num += ceil(num / (-2 * total_length)) * 2 * total_length
+            num += math.ceil(num / (-2 * total_length)) * 2 * total_length
         if num > total_length:
-            num -= floor(num / (2 * total_length)) * 2 * total_length
+            num -= math.floor(num / (2 * total_length)) * 2 * total_length
         if num > upper:
             num = total_length - num
         if num < lower:
@@ -120,9 +151,7 @@ def normalize(num, lower=0, upper=360, b=False):
 
         res = num
 
-    res *= 1.0  # Make all numbers float, to be consistent
-
-    return res
+    return float(res)
 
 
 def ROT1(angle):
@@ -170,6 +199,91 @@ def ROT3(angle):
     
     return rot_mat
     
+def ROT1_vec(angle):
+    """
+    Stack of elementary rotations about the first axis, (N,3,3) for an (N,)
+    array of angles. Same convention as ROT1
+    """
+    angle = np.asarray(angle, dtype=float)
+    cos_a = np.cos(angle)
+    sin_a = np.sin(angle)
+
+    rot_mat = np.zeros(angle.shape + (3,3))
+    rot_mat[...,0,0] = 1.0
+    rot_mat[...,1,1] = cos_a
+    rot_mat[...,1,2] = sin_a
+    rot_mat[...,2,1] = -sin_a
+    rot_mat[...,2,2] = cos_a
+
+    return rot_mat
+
+def ROT2_vec(angle):
+    """
+    Stack of elementary rotations about the second axis, (N,3,3) for an (N,)
+    array of angles. Same convention as ROT2
+    """
+    angle = np.asarray(angle, dtype=float)
+    cos_a = np.cos(angle)
+    sin_a = np.sin(angle)
+
+    rot_mat = np.zeros(angle.shape + (3,3))
+    rot_mat[...,1,1] = 1.0
+    rot_mat[...,0,0] = cos_a
+    rot_mat[...,0,2] = -sin_a
+    rot_mat[...,2,0] = sin_a
+    rot_mat[...,2,2] = cos_a
+
+    return rot_mat
+
+def ROT3_vec(angle):
+    """
+    Stack of elementary rotations about the third axis, (N,3,3) for an (N,)
+    array of angles. Same convention as ROT3
+    """
+    angle = np.asarray(angle, dtype=float)
+    cos_a = np.cos(angle)
+    sin_a = np.sin(angle)
+
+    rot_mat = np.zeros(angle.shape + (3,3))
+    rot_mat[...,2,2] = 1.0
+    rot_mat[...,0,0] = cos_a
+    rot_mat[...,0,1] = sin_a
+    rot_mat[...,1,0] = -sin_a
+    rot_mat[...,1,1] = cos_a
+
+    return rot_mat
+
+def pqw_to_inertial(raan, inc, arg_p):
+    """
+    Rotation matrix from the perifocal (PQW) frame to the inertial frame
+
+    Equal to ROT3(-raan).dot(ROT1(-inc)).dot(ROT3(-arg_p)) but filled in
+    directly from the closed form 3-1-3 expression. Scalar angles give a
+    (3,3) matrix and arrays of angles (broadcast together) give a (...,3,3)
+    stack.
+    """
+    cos_raan = np.cos(raan)
+    sin_raan = np.sin(raan)
+    cos_inc = np.cos(inc)
+    sin_inc = np.sin(inc)
+    cos_argp = np.cos(arg_p)
+    sin_argp = np.sin(arg_p)
+
+    shape = np.broadcast(cos_raan, cos_inc, cos_argp).shape
+    dcm = np.empty(shape + (3,3))
+
+    dcm[...,0,0] = cos_raan*cos_argp - sin_raan*cos_inc*sin_argp
+    dcm[...,0,1] = -cos_raan*sin_argp - sin_raan*cos_inc*cos_argp
+    dcm[...,0,2] = sin_raan*sin_inc
+    dcm[...,1,0] = sin_raan*cos_argp + cos_raan*cos_inc*sin_argp
+    dcm[...,1,1] = -sin_raan*sin_argp + cos_raan*cos_inc*cos_argp
+    dcm[...,1,2] = -cos_raan*sin_inc
+    dcm[...,2,0] = sin_inc*sin_argp
+    dcm[...,2,1] = sin_inc*cos_argp
+    dcm[...,2,2] = cos_inc
+
+    return dcm
+
 if __name__ == "__main__":
     angle = math.pi/4.0
     
@@ -0,0 +1,216 @@
+"""Uniform grid spatial index for proximity queries among many bodies"""
+import numpy as np
+
+# bits per axis of the packed cell key, cell indices are offset to be positive
+_key_bits = 21
+_key_offset = 2**(_key_bits - 1)
+
+class SpatialGrid(object):
+    """
+        Hash grid over a set of positions
+
+        grid = SpatialGrid(r, cell_size)
+
+        Each body is assigned the cubic cell of side cell_size holding it
+        and the bodies are kept sorted by a packed cell key, so the members
+        of any cell are a contiguous range found by binary search. Queries
+        only look at the occupied cells that can contain an answer.
+
+        Inputs:
+           - r - (N,3) positions, e.g. from asteroids_rv (au)
+           - cell_size - side of the grid cells, best close to the typical
+           query radius. Cell indices must fit in 21 bits per axis, so
+           |r|/cell_size is limited to 2**20 and a ValueError is raised
+           otherwise
+
+        Attributes:
+           - positions - (N,3) positions of the bodies
+           - cell_size - side of the grid cells
+    """
+
+    __slots__ = ('positions', 'cell_size', '_keys', '_order', '_sorted_keys',
+                 '_occupied', '_lo', '_hi')
+
+    def __init__(self, r, cell_size):
+        if cell_size <= 0:
+            raise ValueError("cell_size must be positive")
+
+        self.positions = np.array(r, dtype=float).reshape(-1, 3)
+        self.cell_size = float(cell_size)
+        cells = self._cells(self.positions)
+        self._keys = _pack(cells)
+        self._order = np.argsort(self._keys, kind='stable')
+        self._sorted_keys = self._keys[self._order]
+        self._occupy(cells)
+
+    def __len__(self):
+        return self.positions.shape[0]
+
+    def _cells(self, r):
+        cells = np.floor(r/self.cell_size)
+        # each axis has _key_bits bits in the packed key
+        if np.any(cells < -_key_offset) or np.any(cells >= _key_offset):
+            raise ValueError("positions span more than 2**%d cells per axis, "
+                             "increase cell_size" % _key_bits)
+        return cells.astype(np.int64)
+
+    def _occupy(self, cells):
+        """Unique occupied keys and the bounding box of the occupied cells"""
+        first = np.ones(self._sorted_keys.shape, dtype=bool)
+        first[1:] = self._sorted_keys[1:] != self._sorted_keys[:-1]
+        self._occupied = self._sorted_keys[first]
+        if cells.shape[0] == 0:
+            self._lo = np.zeros(3, dtype=np.int64)
+            self._hi = -np.ones(3, dtype=np.int64)
+        else:
+            self._lo = cells.min(axis=0)
+            self._hi = cells.max(axis=0)
+
+    def _box_keys(self, lo, hi):
+        """Occupied keys of the cells from lo to hi (3,), clipped to the occupied cells"""
+        lo = np.maximum(lo, self._lo).astype(np.int64)
+        hi = np.minimum(hi, self._hi).astype(np.int64)
+        if np.any(lo > hi):
+            return np.empty(0, dtype=np.int64)
+
+        # enumerate the box only when it is smaller than the occupied set
+        n_box = np.prod((hi - lo + 1).astype(float))
+        if n_box > self._occupied.shape[0]:
+            cells = _unpack(self._occupied)
+            inside = np.all((cells >= lo) & (cells <= hi), axis=1)
+            return self._occupied[inside]
+
+        axes = [np.arange(lo[k], hi[k] + 1) for k in range(3)]
+        cells = np.stack(np.meshgrid(*axes, indexing='ij'), axis=-1).reshape(-1, 3)
+        return _pack(cells)
+
+    def _members(self, keys):
+        """Start and end of each key's range in the sorted order"""
+        return (np.searchsorted(self._sorted_keys, keys, side='left'),
+                np.searchsorted(self._sorted_keys, keys, side='right'))
+
+    def update(self, r):
+        """
+            Move the bodies to new positions (N,3) of the next epoch
+
+            Only the bodies that changed cell are taken out of the sorted
+            order and merged back in at their new cell, the others keep their
+            place. Returns the number of bodies that changed cell.
+        """
+        r = np.asarray(r, dtype=float).reshape(self.positions.shape)
+        cells = self._cells(r)
+        keys = _pack(cells)
+        moved = np.flatnonzero(keys != self._keys)
+
+        self.positions[...] = r
+        if moved.shape[0] == 0:
+            return 0
+
+        # remove the moved bodies and merge them back in at the new keys
+        stay = keys[self._order] == self._keys[self._order]
+        order = self._order[stay]
+        sorted_keys = self._sorted_keys[stay]
+
+        moved = moved[np.argsort(keys[moved], kind='stable')]
+        at = np.searchsorted(sorted_keys, keys[moved], side='right')
+
+        self._order = np.insert(order, at, moved)
+        self._sorted_keys = np.insert(sorted_keys, at, keys[moved])
+        self._keys = keys
+        self._occupy(cells)
+
+        return moved.shape[0]
+
+    def query_radius(self, point, radius, return_distance=False):
+        """
+            Indices of the bodies within radius of point (3,)
+
+            Sorted by index, with the distances as well if return_distance.
+        """
+        point = np.asarray(point, dtype=float)
+        lo = np.floor((point - radius)/self.cell_size)
+        hi = np.floor((point + radius)/self.cell_size)
+
+        start, end = self._members(self._box_keys(lo, hi))
+
+        idx = self._order[_ranges(start, end)]
+        dist = np.sqrt(np.sum((self.positions[idx] - point)**2, axis=1))
+        inside = dist <= radius
+        idx, dist = idx[inside], dist[inside]
+
+        sort = np.argsort(idx)
+        if return_distance:
+            return (idx[sort], dist[sort])
+        else:
+            return idx[sort]
+
+    def query_knn(self, point, k):
+        """
+            (idx,dist) = grid.query_knn(point, k)
+
+            The k bodies nearest to point (3,), sorted by distance. The
+            search radius starts one cell beyond the distance from point to
+            the occupied cells and doubles until k bodies are found inside
+            it.
+        """
+        k = min(k, len(self))
+        if k == 0:
+            return (np.empty(0, dtype=np.int64), np.empty(0))
+
+        point = np.asarray(point, dtype=float)
+        box_lo = self._lo*self.cell_size
+        box_hi = (self._hi + 1)*self.cell_size
+        gap = np.maximum(np.maximum(box_lo - point, point - box_hi), 0.0)
+        radius = np.sqrt(np.sum(gap*gap)) + self.cell_size
+        while True:
+            idx, dist = self.query_radius(point, radius, return_distance=True)
+            if idx.shape[0] >= k:
+                nearest = np.argsort(dist, kind='stable')[:k]
+                return (idx[nearest], dist[nearest])
+            radius = 2*radius
+
+    def query_pairs(self, radius):
+        """
+            (M,2) index pairs i < j of the bodies closer than radius
+
+            For every body the neighbouring cells are searched, so the cost
+            grows with the number of close bodies and not with N^2.
+        """
+        span = int(np.ceil(radius/self.cell_size))
+        offsets = np.arange(-span, span + 1)
+        offsets = np.stack(np.meshgrid(offsets, offsets, offsets, indexing='ij'), axis=-1).reshape(-1, 3)
+
+        cells = self._cells(self.positions)
+        body = np.arange(len(self))
+        pairs = []
+        for offset in offsets:
+            start, end = self._members(_pack(cells + offset))
+            counts = end - start
+            i = np.repeat(body, counts)
+            j = self._order[_ranges(start, end)]
+
+            keep = j > i
+            i, j = i[keep], j[keep]
+            close = np.sum((self.positions[i] - self.positions[j])**2, axis=1) <= radius*radius
+            pairs.append(np.stack((i[close], j[close]), axis=-1))
+
+        pairs = np.concatenate(pairs)
+        return pairs[np.lexsort((pairs[:, 1], pairs[:, 0]))]
+
+def _pack(cells):
+    """Pack (..., 3) integer cell indices into a single int64 key"""
+    cells = cells + _key_offset
+    return (cells[..., 0] << (2*_key_bits)) | (cells[..., 1] << _key_bits) | cells[..., 2]
+
+def _unpack(keys):
+    """(N,3) integer cell indices of packed keys"""
+    mask = (1 << _key_bits) - 1
+    cells = np.stack((keys >> (2*_key_bits), (keys >> _key_bits) & mask, keys & mask), axis=-1)
+    return cells - _key_offset
+
+def _ranges(start, end):
+    """Concatenation of arange(start[k], end[k]) over all k"""
+    counts = end - start
+    total = np.sum(counts)
+    first = np.cumsum(counts) - counts
+    return np.arange(total) - np.repeat(first - start, counts)